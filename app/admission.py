@@ -0,0 +1,235 @@
+"""Допуск запросов к дорогим маршрутам: лимит параллельности и token bucket.
+
+Группы маршрутов (PDF, вход/регистрация, поиск, пакетная загрузка, выгрузка)
+и их лимиты задаются в settings.ROUTE_LIMITS. Проверка идёт до роутинга и до
+чтения тела, поэтому отказ стоит микросекунды и не занимает threadpool и пул
+соединений:
+
+* 429 + Retry-After — ключ (пользователь из JWT, иначе IP) исчерпал свой bucket;
+* 503 + Retry-After — в группе уже выполняется CONCURRENCY запросов на воркер.
+
+Вход и регистрация ограничиваются по паре Login + IP: за одним NAT или
+прокси у каждого логина свой bucket, а перебор паролей одного логина всё так
+же упирается в лимит. Тело таких запросов маленькое, middleware читает его
+заранее и передаёт приложению без изменений. За доверенным прокси
+(ADMISSION_TRUSTED_PROXIES) IP клиента берётся из X-Forwarded-For.
+
+Дешёвые чтения ни в одну группу не входят и не ограничиваются. Счётчики и
+bucket'ы локальны для воркера: при N воркерах общий лимит — в N раз больше.
+"""
+import math
+import re
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs
+
+import orjson
+from starlette.responses import JSONResponse
+
+from app import metrics
+from app.cache import LRUCache
+from app.config import settings
+from app.utils.security import token_subject
+
+
+class RouteGroup(NamedTuple):
+    name: str
+    methods: frozenset
+    pattern: "re.Pattern"
+    # Группа действует, только если в запросе есть непустой параметр (search=)
+    query_param: Optional[str] = None
+    # Поле JSON-тела, которое вместе с IP образует ключ bucket'а (Login)
+    body_field: Optional[str] = None
+
+
+# Больше тело ради ключа не читаем: такой запрос считается по IP
+_MAX_KEY_BODY = 16 * 1024
+
+ROUTE_GROUPS = (
+    RouteGroup("pdf", frozenset({"GET"}), re.compile(r"/articles/(\d+/pdf|digest)")),
+    RouteGroup("auth", frozenset({"POST"}), re.compile(r"/auth/(login|register)"), body_field="Login"),
+    RouteGroup("search", frozenset({"GET"}), re.compile(r"/articles/(facets)?"), "search"),
+    RouteGroup("bulk", frozenset({"POST"}), re.compile(r"/articles/bulk")),
+    RouteGroup("export", frozenset({"GET"}), re.compile(r"/articles/export")),
+)
+
+
+class Limiter:
+    """Лимиты одной группы маршрутов."""
+
+    def __init__(self, name: str, concurrency: int, per_minute: int, burst: int, max_keys: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.rate = per_minute / 60.0
+        self.capacity = max(burst, 1)
+        self.in_flight = 0
+        # key -> [токены, время]; запись, не тронутая дольше полного пополнения, не нужна:
+        # bucket снова полон, поэтому TTL кэша — время пополнения
+        ttl = self.capacity / self.rate if self.rate else 1
+        self._buckets = LRUCache(max_keys, ttl)
+
+    def retry_after(self, key: str, now: float) -> float:
+        """0 — токен есть, иначе секунд до следующего токена (токен ещё не списан)."""
+        if not self.rate:
+            return 0.0
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return 0.0
+        tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def take(self, key: str, now: float) -> None:
+        if not self.rate:
+            return
+        bucket = self._buckets.get(key)
+        tokens = self.capacity if bucket is None else min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+        self._buckets.set(key, [tokens - 1, now])
+
+    def saturated(self) -> bool:
+        return 0 < self.concurrency <= self.in_flight
+
+
+def build_limiters(limits: Dict[str, Tuple[int, int, int]], max_keys: int) -> Dict[str, Limiter]:
+    return {
+        name: Limiter(name, concurrency, per_minute, burst, max_keys)
+        for name, (concurrency, per_minute, burst) in limits.items()
+        if concurrency or per_minute
+    }
+
+
+def match_group(scope: dict, groups: Iterable[RouteGroup] = ROUTE_GROUPS) -> Optional[RouteGroup]:
+    method, path = scope.get("method"), scope.get("path", "")
+    for group in groups:
+        if method in group.methods and group.pattern.fullmatch(path):
+            if group.query_param is None:
+                return group
+            query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+            if any(v.strip() for v in query.get(group.query_param, ())):
+                return group
+    return None
+
+
+def client_ip(scope: dict) -> str:
+    """Адрес клиента; от доверенного прокси — последний недоверенный адрес из X-Forwarded-For.
+
+    Заголовок читается справа налево: левые адреса клиент может подставить сам.
+    """
+    client = scope.get("client")
+    ip = client[0] if client else "unknown"
+    trusted = settings.ADMISSION_TRUSTED_PROXIES
+    if ip not in trusted:
+        return ip
+    for name, value in scope.get("headers", ()):
+        if name == b"x-forwarded-for":
+            for hop in reversed(value.decode("latin-1").split(",")):
+                hop = hop.strip()
+                if hop and hop not in trusted:
+                    return hop
+            break
+    return ip
+
+
+def client_key(scope: dict) -> str:
+    """Логин из проверенного Bearer-токена, иначе IP клиента.
+
+    Неподписанный или чужой токен ключом не становится, иначе каждый запрос
+    со случайным sub получал бы свежий bucket.
+    """
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                login = token_subject(token.strip())
+                if login:
+                    return "user:" + login
+            break
+    return "ip:" + client_ip(scope)
+
+
+async def read_body(receive) -> Tuple[bytes, List[dict]]:
+    """Тело запроса (до _MAX_KEY_BODY) и прочитанные сообщения для повторной отдачи приложению."""
+    body, messages = b"", []
+    while len(body) <= _MAX_KEY_BODY:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            return body, messages
+    return b"", messages
+
+
+def replay(messages: List[dict], receive):
+    """receive, который сначала отдаёт уже прочитанные сообщения."""
+    pending = list(messages)
+
+    async def wrapped():
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return wrapped
+
+
+def body_key(body: bytes, field: str, scope: dict) -> Optional[str]:
+    try:
+        value = orjson.loads(body).get(field) if body else None
+    except (orjson.JSONDecodeError, AttributeError):
+        return None
+    if not isinstance(value, str) or not value:
+        return None
+    return f"{field.lower()}:{value.lower()}|ip:{client_ip(scope)}"
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail}, status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionMiddleware:
+    """ASGI-middleware: быстрый отказ 429/503 для перегруженных групп маршрутов."""
+
+    def __init__(self, app, limits: Optional[Dict[str, Tuple[int, int, int]]] = None):
+        self.app = app
+        self.limiters = build_limiters(settings.ROUTE_LIMITS if limits is None else limits,
+                                       settings.ADMISSION_BUCKETS)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        route = match_group(scope)
+        limiter = self.limiters.get(route.name) if route else None
+        if limiter is None:
+            return await self.app(scope, receive, send)
+
+        key = ""
+        if limiter.rate:
+            if route.body_field:
+                body, messages = await read_body(receive)
+                receive = replay(messages, receive)
+                key = body_key(body, route.body_field, scope) or client_key(scope)
+            else:
+                key = client_key(scope)
+        group = route.name
+        now = time.monotonic()
+        wait = limiter.retry_after(key, now)
+        if wait:
+            metrics.admission_rejected.inc(group, "rate")
+            return await _reject(429, "Слишком много запросов, повторите позже", wait)(scope, receive, send)
+        if limiter.saturated():
+            # Токен не списываем: запрос не выполнялся
+            metrics.admission_rejected.inc(group, "concurrency")
+            return await _reject(503, "Сервер перегружен, повторите позже", 1)(scope, receive, send)
+        limiter.take(key, now)
+
+        # Один event loop на воркер: счётчик меняется без блокировок
+        limiter.in_flight += 1
+        metrics.admission_in_flight.inc(group)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.in_flight -= 1
+            metrics.admission_in_flight.dec(group)
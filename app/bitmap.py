@@ -0,0 +1,344 @@
+"""Битовый индекс статей по тегам и статусам для фильтров и фасетов.
+
+Для каждого TagId и StatusId хранится множество ArticleId в виде целого
+Python-числа (бит N — статья N). Пересечение/объединение/дополнение — это
+``& | ~`` над такими числами, подсчёт — ``int.bit_count()``. Выражение
+``ESP32 AND (STM32 OR RP2040)`` и счётчики для всех тегов считаются без SQL,
+а в БД уходит только один запрос за строками нужной страницы.
+
+Индекс обновляется из crud при записи и строится из БД при первом обращении
+(и в фоне при старте приложения). Как и поисковый индекс, он локален для
+процесса: записи соседних воркеров подхватываются перестройкой раз в
+BITMAP_REFRESH_SECONDS.
+
+Запрос никогда не ждёт чужую перестройку: с ASYNC_DB_ENABLED он выполняется
+в event loop (AsyncSession.run_sync), и ожидание блокировки остановило бы
+loop, а два таких запроса заблокировали бы друг друга. Пока индекса нет и его
+строит другой поток, ``select_bits`` бросает IndexNotReady, и crud фильтрует
+тем же выражением в SQL (``sql_condition``).
+"""
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, func, not_, or_, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+
+_TOKEN_RE = re.compile(r'\(|\)|"[^"]*"|[^\s()]+')
+_OPERATORS = {"AND", "OR", "NOT"}
+
+
+def bits_from_ids(ids: Iterable[int]) -> int:
+    # Через bytearray: OR по одному биту копировал бы всё число на каждой строке
+    ids = list(ids)
+    if not ids:
+        return 0
+    buf = bytearray(max(ids) // 8 + 1)
+    for article_id in ids:
+        buf[article_id >> 3] |= 1 << (article_id & 7)
+    return int.from_bytes(buf, "little")
+
+
+def iter_ids(bits: int, after_id: Optional[int] = None) -> Iterator[int]:
+    """ArticleId по возрастанию; after_id — keyset, начиная со следующего."""
+    offset = 0
+    if after_id is not None:
+        offset = after_id + 1
+        bits >>= offset
+    while bits:
+        low = bits & -bits
+        yield offset + low.bit_length() - 1
+        bits ^= low
+
+
+@lru_cache(maxsize=1024)
+def parse(expression: str) -> Tuple:
+    """Разбирает выражение в дерево: ("tag", имя|id), ("and"|"or", a, b), ("not", a).
+
+    Приоритет NOT > AND > OR, скобки, имена с пробелами — в кавычках
+    ("Raspberry Pi"). Ошибка синтаксиса — ValueError.
+    """
+    tokens = _TOKEN_RE.findall(expression)
+    if not tokens:
+        raise ValueError("Пустое выражение")
+    pos = 0
+
+    def peek() -> Optional[str]:
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take() -> str:
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def parse_or():
+        node = parse_and()
+        while (peek() or "").upper() == "OR":
+            take()
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_not()
+        while (peek() or "").upper() == "AND":
+            take()
+            node = ("and", node, parse_not())
+        return node
+
+    def parse_not():
+        if (peek() or "").upper() == "NOT":
+            take()
+            return ("not", parse_not())
+        return parse_atom()
+
+    def parse_atom():
+        token = peek()
+        if token is None:
+            raise ValueError("Выражение оборвано")
+        if token == "(":
+            take()
+            node = parse_or()
+            if peek() != ")":
+                raise ValueError("Не закрыта скобка")
+            take()
+            return node
+        if token == ")" or token.upper() in _OPERATORS:
+            raise ValueError(f"Неожиданный токен: {token}")
+        take()
+        if token.startswith('"'):
+            return ("tag", token[1:-1])
+        return ("tag", int(token) if token.isdigit() else token)
+
+    tree = parse_or()
+    if pos != len(tokens):
+        raise ValueError(f"Лишний токен: {tokens[pos]}")
+    return tree
+
+
+class IndexNotReady(RuntimeError):
+    """Индекса ещё нет, а строит его другой поток (ждать его запросу нельзя)."""
+
+
+def sql_condition(tree: Tuple):
+    """То же выражение условием на Article.ArticleId — для запросов, пока индекс строится.
+
+    Неизвестное имя тега здесь не ошибка, а пустое множество.
+    """
+    op = tree[0]
+    if op == "tag":
+        link = models.article_tag.c
+        ref = tree[1]
+        if isinstance(ref, int):
+            ids = select(link.ArticleId).where(link.TagId == ref)
+        else:
+            ids = (
+                select(link.ArticleId)
+                .join(models.Tag, models.Tag.TagId == link.TagId)
+                .where(func.lower(models.Tag.Name) == ref.lower())
+            )
+        return models.Article.ArticleId.in_(ids)
+    if op == "not":
+        return not_(sql_condition(tree[1]))
+    combine = and_ if op == "and" else or_
+    return combine(sql_condition(tree[1]), sql_condition(tree[2]))
+
+
+class BitmapIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.ready = False
+        self.built_at = 0.0
+        self._all = 0
+        self._tags: Dict[int, int] = {}
+        self._statuses: Dict[int, int] = {}
+        self._doc_tags: Dict[int, frozenset] = {}
+        self._doc_status: Dict[int, int] = {}
+        self.tag_names: Dict[int, str] = {}
+        self.status_names: Dict[int, str] = {}
+        self._tag_by_name: Dict[str, int] = {}
+
+    def load(self, articles, article_tags, tags, statuses) -> None:
+        """Заменяет содержимое целиком (перестройка); читатели видят либо старый, либо новый индекс."""
+        doc_status = dict(articles)
+        doc_tags: Dict[int, set] = {}
+        by_tag: Dict[int, List[int]] = {}
+        for article_id, tag_id in article_tags:
+            if article_id in doc_status:
+                doc_tags.setdefault(article_id, set()).add(tag_id)
+                by_tag.setdefault(tag_id, []).append(article_id)
+        by_status: Dict[int, List[int]] = {}
+        for article_id, status_id in doc_status.items():
+            by_status.setdefault(status_id, []).append(article_id)
+        tag_names = dict(tags)
+        with self._lock:
+            self._all = bits_from_ids(doc_status)
+            self._tags = {tag_id: bits_from_ids(ids) for tag_id, ids in by_tag.items()}
+            self._statuses = {status_id: bits_from_ids(ids) for status_id, ids in by_status.items()}
+            self._doc_tags = {article_id: frozenset(ids) for article_id, ids in doc_tags.items()}
+            self._doc_status = doc_status
+            self.tag_names = tag_names
+            self.status_names = dict(statuses)
+            self._tag_by_name = {name.lower(): tag_id for tag_id, name in tag_names.items()}
+            self.built_at = time.monotonic()
+            self.ready = True
+
+    def index(self, article_id: int, status_id: Optional[int] = None,
+              tag_ids: Optional[Iterable[int]] = None) -> None:
+        """Добавляет статью или меняет её статус/теги (None — не менять)."""
+        bit = 1 << article_id
+        with self._lock:
+            self._all |= bit
+            if status_id is not None:
+                old = self._doc_status.get(article_id)
+                if old is not None and old != status_id:
+                    self._statuses[old] &= ~bit
+                self._statuses[status_id] = self._statuses.get(status_id, 0) | bit
+                self._doc_status[article_id] = status_id
+            if tag_ids is not None:
+                new = frozenset(tag_ids)
+                old = self._doc_tags.get(article_id, frozenset())
+                for tag_id in old - new:
+                    self._tags[tag_id] &= ~bit
+                for tag_id in new - old:
+                    self._tags[tag_id] = self._tags.get(tag_id, 0) | bit
+                self._doc_tags[article_id] = new
+
+    def remove(self, article_id: int) -> None:
+        mask = ~(1 << article_id)
+        with self._lock:
+            self._all &= mask
+            status_id = self._doc_status.pop(article_id, None)
+            if status_id is not None:
+                self._statuses[status_id] &= mask
+            for tag_id in self._doc_tags.pop(article_id, ()):
+                self._tags[tag_id] &= mask
+
+    def add_tag(self, tag_id: int, name: str) -> None:
+        with self._lock:
+            self.tag_names[tag_id] = name
+            self._tag_by_name[name.lower()] = tag_id
+
+    def all(self) -> int:
+        return self._all
+
+    def status(self, status_id: int) -> int:
+        return self._statuses.get(status_id, 0)
+
+    def tag(self, tag_id: int) -> int:
+        return self._tags.get(tag_id, 0)
+
+    def evaluate(self, tree: Tuple) -> int:
+        op = tree[0]
+        if op == "tag":
+            ref = tree[1]
+            if isinstance(ref, int):
+                return self.tag(ref)
+            tag_id = self._tag_by_name.get(ref.lower())
+            if tag_id is None:
+                raise ValueError(f"Неизвестный тег: {ref}")
+            return self.tag(tag_id)
+        if op == "not":
+            return self._all & ~self.evaluate(tree[1])
+        left, right = self.evaluate(tree[1]), self.evaluate(tree[2])
+        return left & right if op == "and" else left | right
+
+    def facets(self, bits: int) -> dict:
+        with self._lock:
+            tags = list(self._tags.items())
+            statuses = list(self._statuses.items())
+        return {
+            "total": bits.bit_count(),
+            "tags": sorted(
+                ({"TagId": t, "Name": self.tag_names.get(t), "Count": (bits & b).bit_count()} for t, b in tags),
+                key=lambda f: (-f["Count"], f["TagId"]),
+            ),
+            "statuses": [
+                {"StatusId": s, "Name": self.status_names.get(s), "Count": (bits & b).bit_count()}
+                for s, b in sorted(statuses)
+            ],
+        }
+
+
+index = BitmapIndex()
+_rebuild_lock = threading.Lock()
+
+
+def rebuild(db: Session) -> None:
+    with _rebuild_lock:
+        _rebuild_locked(db)
+
+
+def _rebuild_locked(db: Session) -> None:
+    index.load(
+        db.query(models.Article.ArticleId, models.Article.StatusId).all(),
+        db.query(models.article_tag.c.ArticleId, models.article_tag.c.TagId).all(),
+        db.query(models.Tag.TagId, models.Tag.Name).all(),
+        db.query(models.ArticleStatus.StatusId, models.ArticleStatus.Name).all(),
+    )
+
+
+def refresh_in_background() -> None:
+    """Перестройка в отдельном потоке со своей сессией (старт приложения, устаревший индекс)."""
+    from app.database import SessionLocal
+
+    if not _rebuild_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            with SessionLocal() as db:
+                _rebuild_locked(db)
+        finally:
+            _rebuild_lock.release()
+
+    threading.Thread(target=run, name="bitmap-refresh", daemon=True).start()
+
+
+def ensure_ready(db: Session) -> BitmapIndex:
+    """Индекс, построенный при необходимости; устаревший перестраивается в фоне.
+
+    Если индекса нет, а его уже строит другой поток — IndexNotReady вместо ожидания.
+    """
+    if not index.ready:
+        if not _rebuild_lock.acquire(blocking=False):
+            raise IndexNotReady("Индекс тегов строится, повторите запрос позже")
+        try:
+            if not index.ready:
+                _rebuild_locked(db)
+        finally:
+            _rebuild_lock.release()
+    elif settings.BITMAP_REFRESH_SECONDS and time.monotonic() - index.built_at > settings.BITMAP_REFRESH_SECONDS:
+        refresh_in_background()
+    return index
+
+
+def select_bits(db: Session, expression: Optional[str] = None, status_id: Optional[int] = None,
+                tag_id: Optional[int] = None) -> int:
+    """Битовое множество статей под фильтр; ошибка в выражении — ValueError, индекс строится — IndexNotReady."""
+    idx = ensure_ready(db)
+    bits = idx.evaluate(parse(expression)) if expression else idx.all()
+    if status_id is not None:
+        bits &= idx.status(status_id)
+    if tag_id is not None:
+        bits &= idx.tag(tag_id)
+    return bits
+
+
+def index_article(article_id: int, status_id: Optional[int] = None, tag_ids: Optional[Iterable[int]] = None) -> None:
+    index.index(article_id, status_id, tag_ids)
+
+
+def remove_article(article_id: int) -> None:
+    index.remove(article_id)
+
+
+def add_tag(tag_id: int, name: str) -> None:
+    index.add_tag(tag_id, name)
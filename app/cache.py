@@ -0,0 +1,147 @@
+"""Кэши в памяти процесса.
+
+Каждый воркер держит свою копию, поэтому у всех записей есть TTL: даже если
+инвалидация из соседнего процесса до нас не дошла, данные устареют не дольше
+чем на TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Type
+
+from fastapi import Request, Response
+from pydantic import BaseModel, TypeAdapter
+
+from app.config import settings
+from app.utils.http import conditional_response, make_etag
+
+
+class TTLCache:
+    """Потокобезопасный словарь с временем жизни записей."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            # Два параллельных промаха загрузят значение дважды — для справочников это дешевле блокировки
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class LRUCache:
+    """Ограниченный по размеру кэш с TTL и счётчиком поколений.
+
+    ``generation`` растёт при каждой инвалидации. Читатель запоминает поколение
+    до похода в БД и передаёт его в ``set``: если за это время была запись,
+    устаревший результат в кэш не попадёт.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        with self._lock:
+            self.generation += 1
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Справочники: Gender, ArticleStatus, Tag
+reference_cache = TTLCache(settings.REFERENCE_CACHE_TTL)
+
+# Сериализованные ответы /articles: ключи ("detail", id) и ("list", path, params)
+article_cache = LRUCache(settings.ARTICLE_CACHE_SIZE, settings.ARTICLE_CACHE_TTL)
+
+# Блобы: ("article", id) / ("user", id) -> MediaEntry; миниатюры: (etag, ширина) -> MediaEntry
+media_cache = LRUCache(settings.MEDIA_CACHE_SIZE, settings.MEDIA_CACHE_TTL)
+thumbnail_cache = LRUCache(settings.MEDIA_CACHE_SIZE, settings.MEDIA_CACHE_TTL)
+
+
+def invalidate_article(article_id: Optional[int] = None) -> None:
+    """Вызывается из crud после любой записи в Article: сбрасывает карточку и все списки."""
+    article_cache.invalidate_where(
+        lambda key: key[0] == "list" or (key[0] == "detail" and (article_id is None or key[1] == article_id))
+    )
+    if article_id is not None:
+        media_cache.invalidate(("article", article_id))
+
+
+def cached_reference(request: Request, key: str, schema: Type[BaseModel],
+                     loader: Callable[[], list]) -> Response:
+    """Read-through кэш справочника: JSON и ETag считаются один раз за TTL."""
+    def build():
+        adapter = TypeAdapter(List[schema])
+        body = adapter.dump_json(adapter.validate_python(loader(), from_attributes=True))
+        return body, make_etag(body)
+
+    body, etag = reference_cache.get_or_load(key, build)
+    return conditional_response(
+        request, body, etag,
+        cache_control=f"public, max-age={settings.REFERENCE_CACHE_TTL}",
+    )
@@ -0,0 +1,166 @@
+"""Служебные команды, которые раньше выполнялись при импорте/старте приложения.
+
+Запуск::
+
+    python -m app.cli init-db            # схема + начальные данные
+    python -m app.cli init-db --no-seed  # только схема
+    python -m app.cli backfill-bodies    # Excerpt и сжатие Body у существующих статей
+
+Импорт app.main больше не трогает БД: воркеры стартуют без DDL и без
+проверок справочников, а схему создаёт деплой (или миграции) один раз.
+
+Порядок обновления существующей базы: сначала ``init-db`` (создаёт новые
+таблицы и добавляет новые колонки — Article.Excerpt; повторный запуск ничего
+не меняет), потом выкладка приложения — оно уже читает Excerpt, — и в любой
+момент после неё ``backfill-bodies``: до него у старых статей Excerpt пуст,
+а Body не сжат.
+"""
+import argparse
+import sys
+from datetime import date
+
+from sqlalchemy import Text, bindparam, inspect, literal, select, text, type_coerce, union_all, update
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.compression import decode_body, encode_body
+from app.database import Base, SessionLocal, engine, use_primary
+
+# Таблица -> строки, которыми она заполняется, если пуста
+SEED_DATA = {
+    models.Gender: [
+        dict(GenderId=1, Name="Male"),
+        dict(GenderId=2, Name="Female"),
+    ],
+    models.ArticleStatus: [
+        dict(StatusId=1, Name="Draft"),
+        dict(StatusId=2, Name="Published"),
+    ],
+    models.Tag: [
+        dict(TagId=1, Name="ESP32"),
+        dict(TagId=2, Name="STM32"),
+        dict(TagId=3, Name="Raspberry Pi"),
+    ],
+    models.User: [
+        dict(
+            UserId=1, FirstName="Иван", LastName="Иванов", MiddleName=None,
+            BirthDate=date(1990, 1, 1), GenderId=1, Email="ivan@example.com",
+            Login="ivan", PasswordHash="hash", Photo=None,
+        ),
+    ],
+}
+
+
+def non_empty_tables(db: Session, model_classes) -> set:
+    """Имена непустых таблиц — один запрос вместо COUNT(*) на каждую."""
+    probes = [
+        select(literal(cls.__tablename__).label("name")).where(select(literal(1)).select_from(cls).exists())
+        for cls in model_classes
+    ]
+    return {row[0] for row in db.execute(union_all(*probes))}
+
+
+def seed(db: Session) -> list:
+    """Заполняет пустые справочники и демо-пользователя одной транзакцией."""
+    use_primary(db)
+    filled = non_empty_tables(db, SEED_DATA)
+    seeded = []
+    for cls, rows in SEED_DATA.items():
+        if cls.__tablename__ in filled:
+            continue
+        db.add_all(cls(**row) for row in rows)
+        seeded.append(cls.__tablename__)
+    if seeded:
+        db.commit()
+    return seeded
+
+
+def init_db(with_seed: bool = True) -> None:
+    Base.metadata.create_all(bind=engine)
+    # create_all не меняет существующие таблицы: колонки, добавленные позже, — отдельно
+    if ensure_excerpt_column():
+        print("schema: Article.Excerpt added")
+    print("schema: ok")
+    if with_seed:
+        with SessionLocal() as db:
+            seeded = seed(db)
+        print("seeded: " + (", ".join(seeded) if seeded else "nothing to do"))
+
+
+def ensure_excerpt_column() -> bool:
+    """Добавляет колонку Article.Excerpt в уже созданную схему (create_all её не добавит)."""
+    if "Excerpt" in {c["name"] for c in inspect(engine).get_columns("Article")}:
+        return False
+    column = models.Article.__table__.c.Excerpt
+    quote = engine.dialect.identifier_preparer.quote
+    # Без COLUMN: SQL Server его не принимает, SQLite и PostgreSQL — не требуют
+    ddl = f"ALTER TABLE {quote('Article')} ADD {quote('Excerpt')} {column.type.compile(engine.dialect)} NULL"
+    with engine.begin() as conn:
+        conn.execute(text(ddl))
+    return True
+
+
+def backfill_bodies(db: Session, batch_size: int = 500) -> tuple:
+    """Пересчитывает Excerpt и перекодирует Body под текущий BODY_COMPRESSION.
+
+    Идёт пачками по ArticleId (keyset), пишет только изменившиеся строки
+    одним executemany на пачку. UpdatedAt не трогается: содержимое статьи то
+    же, ETag клиентов остаются действительными. С BODY_COMPRESSION=off
+    команда, наоборот, распаковывает ранее сжатые тексты.
+    """
+    use_primary(db)
+    table = models.Article.__table__
+    # Хранимое значение как есть, мимо распаковки CompressedText
+    stored_body = type_coerce(table.c.Body, Text())
+    stmt = (
+        update(table)
+        .where(table.c.ArticleId == bindparam("b_id"))
+        .values(Body=bindparam("b_body"), Excerpt=bindparam("b_excerpt"), UpdatedAt=table.c.UpdatedAt)
+    )
+    last_id, scanned, changed = 0, 0, 0
+    while True:
+        rows = db.execute(
+            select(table.c.ArticleId, stored_body, table.c.Excerpt)
+            .where(table.c.ArticleId > last_id).order_by(table.c.ArticleId).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        batch = []
+        for article_id, stored, excerpt in rows:
+            body = decode_body(stored)
+            new_excerpt = crud.make_excerpt(body)
+            if encode_body(body) != stored or new_excerpt != excerpt:
+                batch.append({"b_id": article_id, "b_body": body, "b_excerpt": new_excerpt})
+        if batch:
+            db.execute(stmt, batch)
+            db.commit()
+        scanned += len(rows)
+        changed += len(batch)
+        last_id = rows[-1][0]
+        print(f"backfill: {scanned} scanned, {changed} updated (last ArticleId {last_id})")
+    return scanned, changed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    cmd = commands.add_parser("init-db", help="создать таблицы, добавить новые колонки и заполнить справочники")
+    cmd.add_argument("--no-seed", action="store_true", help="не добавлять начальные данные")
+    cmd = commands.add_parser("backfill-bodies", help="заполнить Excerpt и сжать Body существующих статей")
+    cmd.add_argument("--batch-size", type=int, default=500, help="статей на транзакцию")
+    args = parser.parse_args(argv)
+
+    if args.command == "init-db":
+        init_db(with_seed=not args.no_seed)
+    elif args.command == "backfill-bodies":
+        if ensure_excerpt_column():
+            print("schema: Article.Excerpt added")
+        with SessionLocal() as db:
+            scanned, changed = backfill_bodies(db, args.batch_size)
+        print(f"done: {scanned} articles, {changed} updated")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
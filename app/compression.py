@@ -0,0 +1,186 @@
+"""Сжатие: тексты статей в БД и ответы API.
+
+**Article.Body в БД.** ``CompressedText`` — TypeDecorator над Text: при записи
+длинный текст сжимается (BODY_COMPRESSION = zlib | zstd) и хранится как
+``\\x01<кодек>:<base64>``, при чтении распаковывается. Строки без маркера —
+обычный текст, поэтому старые несжатые строки читаются как раньше, а тип
+колонки в БД не меняется. Существующие строки переводятся командой
+``python -m app.cli backfill-bodies``. Сжатый текст не годится для LIKE и
+полнотекстового индекса СУБД — поиск у нас идёт через app.search.
+
+**Ответы.** ``CompressionMiddleware`` сжимает JSON/NDJSON/CSV/текст в br
+(если установлен пакет brotli) или gzip по Accept-Encoding. Поток SSE,
+картинки, PDF, ZIP, ответы с Range и маленькие тела не трогаются. ETag
+сжатого ответа получает суффикс кодировки ("…-gzip"), см. utils.http.encoded_etag.
+"""
+import base64
+import zlib
+from typing import Optional
+
+from sqlalchemy.types import Text, TypeDecorator
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.config import settings
+from app.utils.http import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # br необязателен: без него отдаём gzip
+    brotli = None
+
+_MARKER = "\x01"
+_ZLIB, _ZSTD = "z", "s"
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("Для BODY_COMPRESSION=zstd и чтения zstd-строк нужен пакет zstandard") from None
+    return zstandard
+
+
+def encode_body(text: Optional[str]) -> Optional[str]:
+    """Значение для колонки: сжатое, если включено и это выгодно, иначе исходный текст."""
+    codec = settings.BODY_COMPRESSION
+    if text is None or codec not in ("zlib", "zstd"):
+        return text
+    data = text.encode("utf-8")
+    if len(data) < settings.BODY_COMPRESS_MIN_BYTES:
+        return text
+    if codec == "zstd":
+        packed, tag = _zstd().ZstdCompressor(level=3).compress(data), _ZSTD
+    else:
+        packed, tag = zlib.compress(data, 6), _ZLIB
+    encoded = f"{_MARKER}{tag}:{base64.b64encode(packed).decode('ascii')}"
+    # Сравнение в символах: для NVARCHAR это и есть объём хранения
+    return encoded if len(encoded) < len(text) else text
+
+
+def decode_body(value: Optional[str]) -> Optional[str]:
+    if not value or value[0] != _MARKER:
+        return value
+    packed = base64.b64decode(value[3:])
+    if value[1] == _ZSTD:
+        return _zstd().ZstdDecompressor().decompress(packed).decode("utf-8")
+    return zlib.decompress(packed).decode("utf-8")
+
+
+class CompressedText(TypeDecorator):
+    """Text, прозрачно сжимаемый при записи; читает и сжатые, и обычные строки."""
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return encode_body(value)
+
+    def process_result_value(self, value, dialect):
+        return decode_body(value)
+
+
+_COMPRESSIBLE_PREFIXES = ("text/", "application/json", "application/x-ndjson", "application/xml")
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """br или gzip по Accept-Encoding (с учётом q); None — сжимать нельзя."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for name in candidates:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=settings.BROTLI_QUALITY)
+        else:
+            # wbits=31 — формат gzip (заголовок и CRC)
+            self._obj = zlib.compressobj(settings.GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        # Сброс после каждой порции: клиент потоковой выгрузки получает строки сразу
+        if self.encoding == "br":
+            return self._obj.process(data) + self._obj.flush()
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._obj.process(data) + self._obj.finish()
+        return self._obj.compress(data) + self._obj.flush()
+
+
+class CompressionMiddleware:
+    """ASGI-middleware: gzip/br для сжимаемых ответов от RESPONSE_COMPRESS_MIN_BYTES."""
+
+    def __init__(self, app, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = settings.RESPONSE_COMPRESS_MIN_BYTES if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start["headers"])
+                if not self._compressible(start["status"], headers) or (not more and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+                compressor = _Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["ETag"], encoding)
+                if more:
+                    del headers["Content-Length"]
+                    await send(start)
+                    return await send({"type": "http.response.body", "body": compressor.chunk(body), "more_body": True})
+                data = compressor.finish(body)
+                headers["Content-Length"] = str(len(data))
+                await send(start)
+                return await send({"type": "http.response.body", "body": data})
+            data = compressor.chunk(body) if more else compressor.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _compressible(status: int, headers: MutableHeaders) -> bool:
+        if status < 200 or status in (204, 206, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        if content_type.startswith("text/event-stream"):
+            return False
+        return content_type.startswith(_COMPRESSIBLE_PREFIXES) or content_type.split(";")[0].endswith("+json")
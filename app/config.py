@@ -0,0 +1,158 @@
+"""Настройки приложения из переменных окружения."""
+import os
+from typing import Tuple
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_limit(group: str, concurrency: int, per_minute: int, burst: int) -> Tuple[int, int, int]:
+    # LIMIT_<GROUP>_CONCURRENCY / _PER_MINUTE / _BURST
+    return (
+        _env_int(f"LIMIT_{group}_CONCURRENCY", concurrency),
+        _env_int(f"LIMIT_{group}_PER_MINUTE", per_minute),
+        _env_int(f"LIMIT_{group}_BURST", burst),
+    )
+
+
+class Settings:
+    def __init__(self):
+        # База данных. Для локального нагрузочного теста: DATABASE_URL=sqlite:///./bench.db
+        self.DATABASE_URL = os.getenv(
+            "DATABASE_URL",
+            "mssql+pyodbc://"
+            "@DESKTOP-VO4BHVT\\SQLEXPRESS/MicrocontrollersNews"
+            "?driver=ODBC+Driver+17+for+SQL+Server&trusted_connection=yes",
+        )
+        self.DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 10)
+        self.DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 20)
+        self.DB_POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 30)
+        self.DB_POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)
+        self.DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+        self.DB_ECHO = _env_bool("DB_ECHO", False)
+
+        # Асинхронный путь (нужен aioodbc для SQL Server или aiosqlite для SQLite).
+        # Если ASYNC_DATABASE_URL не задан, он выводится из DATABASE_URL.
+        self.ASYNC_DB_ENABLED = _env_bool("ASYNC_DB_ENABLED", False)
+        self.ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+
+        # Реплики для чтения (через запятую). Пусто — всё идёт в DATABASE_URL.
+        # После записи клиент читает с primary ещё REPLICA_STICKY_SECONDS (read-your-writes),
+        # упавшая реплика исключается на REPLICA_RETRY_SECONDS. Кэш ответов /articles заполняется
+        # только чтениями с primary, клиенты в окне read-your-writes читают мимо него.
+        self.REPLICA_DATABASE_URLS = [u.strip() for u in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if u.strip()]
+        self.REPLICA_STICKY_SECONDS = _env_int("REPLICA_STICKY_SECONDS", 5)
+        self.REPLICA_RETRY_SECONDS = _env_int("REPLICA_RETRY_SECONDS", 30)
+
+        # Полнотекстовый поиск: memory | fts5
+        self.SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "memory").lower()
+        self.SEARCH_FTS_PATH = os.getenv("SEARCH_FTS_PATH", ":memory:")
+        # Построение индекса в фоне при старте, период перестройки (записи других воркеров;
+        # 0 — только при первом обращении) и сколько лучших совпадений отдаёт один запрос
+        self.SEARCH_WARMUP = _env_bool("SEARCH_WARMUP", True)
+        self.SEARCH_REFRESH_SECONDS = _env_int("SEARCH_REFRESH_SECONDS", 60)
+        self.SEARCH_MAX_HITS = _env_int("SEARCH_MAX_HITS", 500)
+
+        # Кэш справочников (секунды): и в памяти, и Cache-Control: max-age для браузеров/CDN
+        self.REFERENCE_CACHE_TTL = _env_int("REFERENCE_CACHE_TTL", 300)
+        # LRU сериализованных ответов /articles
+        self.ARTICLE_CACHE_SIZE = _env_int("ARTICLE_CACHE_SIZE", 2048)
+        self.ARTICLE_CACHE_TTL = _env_int("ARTICLE_CACHE_TTL", 60)
+
+        # PDF: размер пула процессов (0 — рендер в threadpool), кэш готовых файлов
+        self.PDF_WORKERS = _env_int("PDF_WORKERS", 2)
+        self.PDF_CACHE_SIZE = _env_int("PDF_CACHE_SIZE", 256)
+        self.PDF_CACHE_TTL = _env_int("PDF_CACHE_TTL", 3600)
+        self.PDF_DIGEST_MAX = _env_int("PDF_DIGEST_MAX", 100)
+
+        # Картинки статей и фото пользователей (кэш блобов и миниатюр)
+        self.MEDIA_CACHE_SIZE = _env_int("MEDIA_CACHE_SIZE", 256)
+        self.MEDIA_CACHE_TTL = _env_int("MEDIA_CACHE_TTL", 600)
+        self.MEDIA_CACHE_MAX_BYTES = _env_int("MEDIA_CACHE_MAX_BYTES", 1024 * 1024)
+        self.THUMBNAIL_MAX_WIDTH = _env_int("THUMBNAIL_MAX_WIDTH", 1024)
+
+        # Кэш проверенных токенов и uid в claims (маршрутам на Principal SELECT из User нужен
+        # только при промахе кэша, с uid — по первичному ключу)
+        self.PRINCIPAL_CACHE_SIZE = _env_int("PRINCIPAL_CACHE_SIZE", 10000)
+        self.PRINCIPAL_CACHE_TTL = _env_int("PRINCIPAL_CACHE_TTL", 300)
+        self.TOKEN_EMBED_CLAIMS = _env_bool("TOKEN_EMBED_CLAIMS", True)
+
+        # bcrypt: cost и отдельный пул процессов (0 — хешировать в threadpool).
+        # PASSWORD_HASH_QUEUE — сколько задач может ждать сверх занятых воркеров, дальше 503.
+        self.BCRYPT_ROUNDS = _env_int("BCRYPT_ROUNDS", 12)
+        self.PASSWORD_HASH_WORKERS = _env_int("PASSWORD_HASH_WORKERS", 2)
+        self.PASSWORD_HASH_QUEUE = _env_int("PASSWORD_HASH_QUEUE", 16)
+
+        # Пакетная загрузка статей: строк на транзакцию по умолчанию и максимум за запрос
+        self.BULK_COMMIT_SIZE = _env_int("BULK_COMMIT_SIZE", 500)
+        self.BULK_MAX_ITEMS = _env_int("BULK_MAX_ITEMS", 50000)
+
+        # Метрики: /metrics в формате Prometheus и лог SQL медленнее порога (мс)
+        self.METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+        self.SLOW_QUERY_MS = _env_int("SLOW_QUERY_MS", 200)
+
+        # Битовый индекс тегов/статусов: построение в фоне при старте и период перестройки
+        # (подхватывает записи других воркеров; 0 — только при первом обращении)
+        self.BITMAP_WARMUP = _env_bool("BITMAP_WARMUP", True)
+        self.BITMAP_REFRESH_SECONDS = _env_int("BITMAP_REFRESH_SECONDS", 60)
+
+        # Лента изменений /articles/changes (SSE): сколько последних событий доступно
+        # для продолжения по Last-Event-ID, период ping и лимит подписчиков на воркер
+        self.EVENTS_REPLAY_SIZE = _env_int("EVENTS_REPLAY_SIZE", 1024)
+        self.EVENTS_HEARTBEAT_SECONDS = _env_int("EVENTS_HEARTBEAT_SECONDS", 15)
+        self.EVENTS_RETRY_MS = _env_int("EVENTS_RETRY_MS", 3000)
+        self.EVENTS_MAX_SUBSCRIBERS = _env_int("EVENTS_MAX_SUBSCRIBERS", 10000)
+
+        # Счётчики просмотров/скачиваний PDF (app/counters.py): сброс в ArticleCounter раз в
+        # COUNTERS_FLUSH_SECONDS пачками по COUNTERS_FLUSH_BATCH статей (транзакция на пачку).
+        # Trending: период полураспада, вес скачивания относительно просмотра и сколько статей
+        # держать в рейтинге
+        self.COUNTERS_ENABLED = _env_bool("COUNTERS_ENABLED", True)
+        self.COUNTERS_FLUSH_SECONDS = _env_int("COUNTERS_FLUSH_SECONDS", 10)
+        self.COUNTERS_FLUSH_BATCH = _env_int("COUNTERS_FLUSH_BATCH", 500)
+        self.TRENDING_HALF_LIFE_MINUTES = _env_int("TRENDING_HALF_LIFE_MINUTES", 60)
+        self.TRENDING_DOWNLOAD_WEIGHT = _env_int("TRENDING_DOWNLOAD_WEIGHT", 3)
+        self.TRENDING_CAPACITY = _env_int("TRENDING_CAPACITY", 10000)
+
+        # Хранение Article.Body: off | zlib | zstd (сжатые строки читаются при любом значении,
+        # существующие переводятся python -m app.cli backfill-bodies); тексты короче
+        # BODY_COMPRESS_MIN_BYTES не сжимаются. EXCERPT_LENGTH — длина Excerpt для списков (до 299)
+        self.BODY_COMPRESSION = os.getenv("BODY_COMPRESSION", "off").lower()
+        self.BODY_COMPRESS_MIN_BYTES = _env_int("BODY_COMPRESS_MIN_BYTES", 1024)
+        self.EXCERPT_LENGTH = _env_int("EXCERPT_LENGTH", 280)
+
+        # Сжатие ответов по Accept-Encoding: br (если установлен brotli) или gzip
+        self.RESPONSE_COMPRESSION = _env_bool("RESPONSE_COMPRESSION", True)
+        self.RESPONSE_COMPRESS_MIN_BYTES = _env_int("RESPONSE_COMPRESS_MIN_BYTES", 1024)
+        self.GZIP_LEVEL = _env_int("GZIP_LEVEL", 5)
+        self.BROTLI_QUALITY = _env_int("BROTLI_QUALITY", 4)
+
+        # Допуск к дорогим маршрутам (app/admission.py). На группу: одновременных запросов
+        # на воркер (сверх — 503), запросов в минуту на пользователя или IP и запас сверх
+        # среднего темпа (сверх — 429); 0 — без лимита. ADMISSION_BUCKETS — сколько
+        # ключей (пользователь/IP) помнить на группу. ADMISSION_TRUSTED_PROXIES — адреса
+        # своих прокси/балансировщиков (через запятую): за ними IP клиента берётся из X-Forwarded-For.
+        self.ADMISSION_ENABLED = _env_bool("ADMISSION_ENABLED", True)
+        self.ADMISSION_BUCKETS = _env_int("ADMISSION_BUCKETS", 100000)
+        self.ADMISSION_TRUSTED_PROXIES = frozenset(
+            p.strip() for p in os.getenv("ADMISSION_TRUSTED_PROXIES", "").split(",") if p.strip()
+        )
+        self.ROUTE_LIMITS = {
+            "pdf": _env_limit("PDF", 4, 30, 10),
+            "auth": _env_limit("AUTH", 0, 10, 5),
+            "search": _env_limit("SEARCH", 8, 120, 30),
+            "bulk": _env_limit("BULK", 2, 10, 2),
+            "export": _env_limit("EXPORT", 2, 10, 2),
+        }
+
+
+settings = Settings()
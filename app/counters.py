@@ -0,0 +1,185 @@
+"""Счётчики просмотров и скачиваний с отложенной записью и рейтинг «популярное сейчас».
+
+GET /articles/{id} и /articles/{id}/pdf только увеличивают числа в словаре
+воркера. Фоновый поток раз в COUNTERS_FLUSH_SECONDS забирает накопленное и
+пишет его в ArticleCounter пакетными upsert (crud.add_article_counters) по
+COUNTERS_FLUSH_BATCH статей, каждая пачка — своей транзакцией. Если пачка не
+записалась, её приращения возвращаются в буфер и уйдут со следующим сбросом,
+остальные пачки пишутся как обычно; при остановке воркера буфер сбрасывается
+в последний раз.
+
+Trending — экспоненциально затухающий счёт с периодом полураспада
+TRENDING_HALF_LIFE_MINUTES. Затухание «прямое»: хит в момент t весит
+2^((t - t0) / H), поэтому накопленные очки не пересчитываются, а их порядок
+совпадает с порядком затухших значений. Рейтинг, как и остальные индексы в
+памяти, локален для воркера.
+"""
+import heapq
+import logging
+import threading
+import time
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import crud, metrics
+from app.config import settings
+from app.database import SessionLocal, use_primary
+
+logger = logging.getLogger("app.counters")
+
+# Показатель степени, после которого счёт переводится на новую базу t0 (до переполнения float далеко)
+_REBASE_EXPONENT = 64.0
+# Сколько первых мест пересчитывать за раз и как долго отдавать их без пересчёта
+_TOP_SIZE = 100
+_TOP_TTL = 1.0
+
+
+class CounterBuffer:
+    """ArticleId -> [просмотры, скачивания], ещё не записанные в БД."""
+
+    def __init__(self):
+        self._pending: Dict[int, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, article_id: int, views: int = 0, downloads: int = 0) -> None:
+        with self._lock:
+            counts = self._pending.get(article_id)
+            if counts is None:
+                self._pending[article_id] = [views, downloads]
+            else:
+                counts[0] += views
+                counts[1] += downloads
+
+    def drain(self) -> Dict[int, Tuple[int, int]]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return {article_id: (c[0], c[1]) for article_id, c in pending.items()}
+
+    def restore(self, deltas: Dict[int, Tuple[int, int]]) -> None:
+        for article_id, (views, downloads) in deltas.items():
+            self.add(article_id, views, downloads)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+
+class Trending:
+    def __init__(self, half_life_seconds: float, capacity: int):
+        self.half_life = max(half_life_seconds, 1.0)
+        self.capacity = max(capacity, _TOP_SIZE)
+        self._t0 = time.monotonic()
+        self._scores: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._top: Tuple[float, List[Tuple[int, float]]] = (0.0, [])
+
+    def add(self, article_id: int, weight: float = 1.0, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            exponent = (now - self._t0) / self.half_life
+            if exponent > _REBASE_EXPONENT:
+                self._rebase(now)
+                exponent = 0.0
+            self._scores[article_id] = self._scores.get(article_id, 0.0) + weight * 2.0 ** exponent
+            if len(self._scores) > 2 * self.capacity:
+                # Отсечение хвоста амортизировано: раз на capacity новых статей
+                self._scores = dict(heapq.nlargest(self.capacity, self._scores.items(), key=itemgetter(1)))
+
+    def _rebase(self, now: float) -> None:
+        factor = 2.0 ** (-(now - self._t0) / self.half_life)
+        self._scores = {k: v * factor for k, v in self._scores.items() if v * factor > 1e-9}
+        self._t0 = now
+
+    def remove(self, article_id: int) -> None:
+        with self._lock:
+            self._scores.pop(article_id, None)
+            self._top = (0.0, [])
+
+    def top(self, n: int, now: Optional[float] = None) -> List[Tuple[int, float]]:
+        """(ArticleId, затухший счёт в «просмотрах») по убыванию; первые места кэшируются на секунду."""
+        now = time.monotonic() if now is None else now
+        computed_at, ranked = self._top
+        if now - computed_at > _TOP_TTL or n > _TOP_SIZE:
+            with self._lock:
+                factor = 2.0 ** (-(now - self._t0) / self.half_life)
+                best = heapq.nlargest(max(n, _TOP_SIZE), self._scores.items(), key=itemgetter(1))
+            ranked = [(article_id, score * factor) for article_id, score in best]
+            self._top = (now, ranked)
+        return ranked[:n]
+
+
+buffer = CounterBuffer()
+trending = Trending(settings.TRENDING_HALF_LIFE_MINUTES * 60, settings.TRENDING_CAPACITY)
+metrics.registry.add_collector(lambda: metrics.counters_pending.set(value=len(buffer)))
+
+
+def record_view(article_id: int) -> None:
+    if settings.COUNTERS_ENABLED:
+        buffer.add(article_id, views=1)
+        trending.add(article_id)
+
+
+def record_download(article_id: int) -> None:
+    if settings.COUNTERS_ENABLED:
+        buffer.add(article_id, downloads=1)
+        trending.add(article_id, settings.TRENDING_DOWNLOAD_WEIGHT)
+
+
+def forget(article_id: int) -> None:
+    """Статья удалена: из рейтинга её убираем сразу, накопленное отсеет сам upsert."""
+    trending.remove(article_id)
+
+
+def flush() -> int:
+    """Пишет накопленные счётчики в БД; возвращает число статей."""
+    deltas = sorted(buffer.drain().items())
+    written = 0
+    # Пачки ограничены: SELECT ... IN и MERGE укладываются в лимит 2100 параметров SQL Server,
+    # а неудачная пачка не мешает остальным
+    batch_size = max(settings.COUNTERS_FLUSH_BATCH, 1)
+    with SessionLocal() as db:
+        use_primary(db)
+        for start in range(0, len(deltas), batch_size):
+            batch = dict(deltas[start:start + batch_size])
+            try:
+                written += crud.add_article_counters(db, batch)
+            except SQLAlchemyError:
+                db.rollback()
+                logger.warning("counter flush failed, %d articles kept for retry", len(batch), exc_info=True)
+                buffer.restore(batch)
+                metrics.counter_flushes.inc("error")
+                continue
+            metrics.counter_flushes.inc("ok")
+    return written
+
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def _run() -> None:
+    while not _stop.wait(settings.COUNTERS_FLUSH_SECONDS):
+        try:
+            flush()
+        except Exception:  # поток сброса не должен умирать от одной неудачной пачки
+            logger.exception("counter flush crashed")
+
+
+def start() -> None:
+    global _thread
+    if not settings.COUNTERS_ENABLED or _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="counters-flush", daemon=True)
+    _thread.start()
+
+
+def stop() -> None:
+    """Останавливает поток и сбрасывает остаток буфера."""
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=settings.COUNTERS_FLUSH_SECONDS + 5)
+        _thread = None
+    flush()
@@ -1,91 +1,636 @@
-from sqlalchemy import func
-from sqlalchemy.orm import Session
-from . import models, schemas
-from typing import Optional
+from sqlalchemy import delete, false, func, insert, or_, text, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
+from . import bitmap, events, models, schemas
+from . import search as search_index
+from .cache import invalidate_article, reference_cache
+from .serialization import article_dto
+from .config import settings
+from itertools import islice
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from datetime import datetime
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
+def get_users(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None,
+              fields: Optional[Tuple[str, ...]] = None):
     # Добавляем сортировку по UserId для корректной работы с OFFSET в SQL Server
-    return db.query(models.User).order_by(models.User.UserId).offset(skip).limit(limit).all()
+    query = db.query(models.User).order_by(models.User.UserId)
+    if fields is not None:
+        # fields (serialization.select_fields) — колонки UserOut; остальные в SELECT не попадают
+        query = query.options(load_only(*(getattr(models.User, name) for name in fields)))
+    if after_id is not None:
+        # Keyset: seek по кластерному индексу вместо OFFSET
+        return query.filter(models.User.UserId > after_id).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
 
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.UserId == user_id).first()
 
+def get_user_photo(db: Session, user_id: int):
+    # Одна колонка без гидрации ORM; None — нет пользователя, (None,) — нет фото
+    return db.query(models.User.Photo).filter(models.User.UserId == user_id).first()
+
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.Email == email).first()
 
 def get_user_by_login(db: Session, login: str):
     return db.query(models.User).filter(models.User.Login == login).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = hash_password(user.password)  # Предполагаем, что у вас есть функция хеширования
+def create_user(db: Session, user: schemas.UserCreate, password_hash: str):
+    # Хеш считается заранее в пуле bcrypt (utils.security.hash_password_async)
     db_user = models.User(
-        FirstName=user.first_name,
-        LastName=user.last_name,
-        MiddleName=user.middle_name,
-        BirthDate=user.birth_date,
-        GenderId=user.gender_id,
-        Email=user.email,
-        Login=user.login,
-        PasswordHash=hashed_password
+        FirstName=user.FirstName,
+        LastName=user.LastName,
+        MiddleName=user.MiddleName,
+        BirthDate=user.BirthDate,
+        GenderId=user.GenderId,
+        Email=user.Email,
+        Login=user.Login,
+        PasswordHash=password_hash,
+        Photo=user.Photo
     )
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
     return db_user
 
+def update_password_hash(db: Session, user_id: int, password_hash: str):
+    db.query(models.User).filter(models.User.UserId == user_id).update(
+        {models.User.PasswordHash: password_hash}, synchronize_session=False
+    )
+    db.commit()
+
+def article_load_options():
+    # Всё, что трогает schemas.ArticleOut, грузим заранее: Author/Status одним JOIN,
+    # Tags — одним SELECT ... IN на всю страницу. Итого 2 запроса на страницу любого размера.
+    return (
+        joinedload(models.Article.Author),
+        joinedload(models.Article.Status),
+        selectinload(models.Article.Tags),
+    )
+
+def _article_row_query(db: Session, fields: Optional[Tuple[str, ...]] = None):
+    # Плоские строки для DTO: статья, автор и статус одним JOIN, без ORM-гидрации
+    if fields is not None:
+        return _article_projection_query(db, fields)
+    a, u, s = models.Article, models.User, models.ArticleStatus
+    return (
+        db.query(
+            a.ArticleId, a.AuthorId, a.Title, a.Body, a.StatusId, a.CreatedAt, a.UpdatedAt, a.Excerpt,
+            u.FirstName, u.LastName, u.MiddleName, u.BirthDate, u.GenderId, u.Email, u.Login,
+            u.CreatedAt.label("AuthorCreatedAt"), s.Name.label("StatusName"),
+        )
+        .select_from(a)
+        .join(u, a.AuthorId == u.UserId)
+        .join(s, a.StatusId == s.StatusId)
+    )
+
+def _article_projection_query(db: Session, fields: Tuple[str, ...]):
+    # Только колонки запрошенных полей; JOIN к User/ArticleStatus — только ради Author/Status
+    a, u, s = models.Article, models.User, models.ArticleStatus
+    columns = {"ArticleId": a.ArticleId}
+    for name in fields:
+        if name not in ("Author", "Status", "Tags"):
+            columns[name] = getattr(a, name)
+    if "Author" in fields:
+        columns["AuthorId"] = a.AuthorId
+        for name in ("FirstName", "LastName", "MiddleName", "BirthDate", "GenderId", "Email", "Login"):
+            columns[name] = getattr(u, name)
+        columns["AuthorCreatedAt"] = u.CreatedAt.label("AuthorCreatedAt")
+    if "Status" in fields:
+        columns["StatusId"] = a.StatusId
+        columns["StatusName"] = s.Name.label("StatusName")
+    query = db.query(*columns.values()).select_from(a)
+    if "Author" in fields:
+        query = query.join(u, a.AuthorId == u.UserId)
+    if "Status" in fields:
+        query = query.join(s, a.StatusId == s.StatusId)
+    return query
+
+def _article_dtos(db: Session, rows, fields: Optional[Tuple[str, ...]] = None) -> List[dict]:
+    # Теги страницы — один SELECT ... IN, как selectinload; без Tags в fields запроса нет
+    tags = {row.ArticleId: [] for row in rows}
+    if tags and (fields is None or "Tags" in fields):
+        tag_rows = (
+            db.query(models.article_tag.c.ArticleId, models.Tag.TagId, models.Tag.Name)
+            .join(models.Tag, models.Tag.TagId == models.article_tag.c.TagId)
+            .filter(models.article_tag.c.ArticleId.in_(list(tags)))
+            .order_by(models.article_tag.c.ArticleId, models.Tag.TagId)
+        )
+        for article_id, tag_id, name in tag_rows:
+            tags[article_id].append({"TagId": tag_id, "Name": name})
+    return [article_dto(row, tags[row.ArticleId], fields) for row in rows]
+
+def _filter_articles(
+    query,
+    status_id: Optional[int] = None,
+    tag_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    condition=None
+):
+    if condition is not None:
+        query = query.filter(condition)
+    if status_id is not None:
+        query = query.filter(models.Article.StatusId == status_id)
+    if tag_id is not None:
+        query = query.join(models.article_tag).filter(models.article_tag.c.TagId == tag_id)
+    if date_from is not None:
+        query = query.filter(models.Article.CreatedAt >= date_from)
+    if date_to is not None:
+        query = query.filter(models.Article.CreatedAt < date_to)
+    return query
+
 def get_articles(
     db: Session,
     skip: int = 0,
     limit: int = 100,
     status_id: Optional[int] = None,
     search: Optional[str] = None,
-    tag_id: Optional[int] = None
+    tag_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    as_dto: bool = False,
+    tag_expr: Optional[str] = None,
+    fields: Optional[Tuple[str, ...]] = None
 ):
-    query = db.query(models.Article).order_by(models.Article.ArticleId)
-    if status_id is not None:
-        query = query.filter(models.Article.StatusId == status_id)
+    """ORM-объекты Article или, при as_dto=True, готовые словари в форме ArticleOut.
+
+    tag_expr — выражение по тегам ("ESP32 AND (STM32 OR 4)"), считается по
+    битовому индексу (пока он строится в другом потоке — в SQL); ошибка в
+    выражении — ValueError. fields (только для as_dto) — поля ответа из
+    serialization.select_fields: в SELECT попадают лишь их колонки. Поиск
+    упорядочен по релевантности, keyset (after_id) к нему неприменим — ValueError.
+    """
+    if search is not None and after_id is not None:
+        raise ValueError("cursor нельзя сочетать с search: листайте результаты поиска через skip")
+    condition = None
+    if tag_expr is not None:
+        if date_from is not None or date_to is not None:
+            raise ValueError("Фильтр по датам вместе с выражением по тегам не поддерживается")
+        try:
+            return _bitmap_articles(db, tag_expr, skip, limit, status_id, tag_id, search, after_id, as_dto, fields)
+        except bitmap.IndexNotReady:
+            condition = bitmap.sql_condition(bitmap.parse(tag_expr))
     if search is not None:
-        query = query.filter(func.lower(models.Article.Title).like(f"%{search.lower()}%"))
-    if tag_id is not None:
-        query = query.join(models.article_tag).filter(models.article_tag.c.TagId == tag_id)
-    return query.offset(skip).limit(limit).all()
+        return _search_articles(db, search, skip, limit, status_id, tag_id, date_from, date_to, as_dto, fields,
+                                condition)
+    if as_dto:
+        query = _article_row_query(db, fields)
+    else:
+        query = db.query(models.Article).options(*article_load_options())
+    query = _filter_articles(query.order_by(models.Article.ArticleId), status_id, tag_id, date_from, date_to,
+                             condition)
+    if after_id is not None:
+        # Keyset: seek по (ArticleId), (StatusId, ArticleId) или (TagId, ArticleId),
+        # глубина страницы на время запроса не влияет
+        query = query.filter(models.Article.ArticleId > after_id)
+    else:
+        query = query.offset(skip)
+    rows = query.limit(limit).all()
+    return _article_dtos(db, rows, fields) if as_dto else rows
+
+def _ranked_ids(db: Session, search: str) -> List[int]:
+    # Индекс строит другой поток — запрос не ждёт его, а ищет в SQL
+    try:
+        return search_index.search_articles(db, search)
+    except search_index.IndexNotReady:
+        return search_index.sql_search(db, search)
+
+def _search_articles(db: Session, search: str, skip: int, limit: int,
+                     status_id: Optional[int], tag_id: Optional[int],
+                     date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                     as_dto: bool = False, fields: Optional[Tuple[str, ...]] = None, condition=None):
+    # Поиск идёт по индексу (app.search), SQL получает только список ArticleId
+    ranked = _ranked_ids(db, search)
+    if any(f is not None for f in (status_id, tag_id, date_from, date_to, condition)):
+        allowed = {
+            row[0] for row in _filter_articles(
+                db.query(models.Article.ArticleId).filter(models.Article.ArticleId.in_(ranked)),
+                status_id, tag_id, date_from, date_to, condition,
+            )
+        }
+        ranked = [article_id for article_id in ranked if article_id in allowed]
+    return _hydrate_page(db, ranked[skip:skip + limit], as_dto, fields)
+
+def _bitmap_articles(db: Session, tag_expr: str, skip: int, limit: int, status_id: Optional[int],
+                     tag_id: Optional[int], search: Optional[str], after_id: Optional[int], as_dto: bool,
+                     fields: Optional[Tuple[str, ...]] = None):
+    # Фильтр целиком в битовом индексе (app.bitmap), SQL получает только ArticleId страницы
+    bits = bitmap.select_bits(db, tag_expr, status_id, tag_id)
+    if search is not None:
+        ranked = [article_id for article_id in _ranked_ids(db, search) if bits >> article_id & 1]
+        page_ids = ranked[skip:skip + limit]
+    elif after_id is not None:
+        page_ids = list(islice(bitmap.iter_ids(bits, after_id), limit))
+    else:
+        page_ids = list(islice(bitmap.iter_ids(bits), skip, skip + limit))
+    return _hydrate_page(db, page_ids, as_dto, fields)
+
+def article_facets(db: Session, tag_expr: Optional[str] = None, status_id: Optional[int] = None,
+                   tag_id: Optional[int] = None, search: Optional[str] = None) -> dict:
+    """Число статей под фильтром и разбивка по тегам и статусам.
+
+    Считаются только по битовому индексу: пока его строит другой поток — bitmap.IndexNotReady.
+    """
+    bits = bitmap.select_bits(db, tag_expr, status_id, tag_id)
+    if search is not None:
+        bits &= bitmap.bits_from_ids(_ranked_ids(db, search))
+    return bitmap.index.facets(bits)
+
+def _hydrate_page(db: Session, page_ids: List[int], as_dto: bool, fields: Optional[Tuple[str, ...]] = None):
+    # Одна выборка строк страницы с сохранением порядка page_ids
+    if not page_ids:
+        return []
+    if as_dto:
+        query = _article_row_query(db, fields)
+    else:
+        query = db.query(models.Article).options(*article_load_options())
+    rows = query.filter(models.Article.ArticleId.in_(page_ids)).all()
+    order = {article_id: pos for pos, article_id in enumerate(page_ids)}
+    rows = sorted(rows, key=lambda a: order[a.ArticleId])
+    return _article_dtos(db, rows, fields) if as_dto else rows
+
+def get_article_image(db: Session, article_id: int):
+    return db.query(models.Article.Image).filter(models.Article.ArticleId == article_id).first()
+
+def get_articles_for_digest(
+    db: Session,
+    ids: Optional[List[int]] = None,
+    tag_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = 100
+):
+    # Для PDF нужны только колонки самой статьи — связи не грузим
+    query = _filter_articles(db.query(models.Article), tag_id=tag_id, date_from=date_from, date_to=date_to)
+    if ids:
+        query = query.filter(models.Article.ArticleId.in_(ids))
+    return query.order_by(models.Article.ArticleId).limit(limit).all()
+
+EXPORT_COLUMNS = ("ArticleId", "AuthorId", "Title", "Body", "StatusId", "CreatedAt", "UpdatedAt")
+
+def iter_articles_for_export(
+    db: Session,
+    tags_db: Session,
+    status_id: Optional[int] = None,
+    tag_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    batch_size: int = 1000
+):
+    """Генератор пачек словарей для выгрузки: строки читаются серверным курсором
+    (yield_per), память не растёт с размером архива.
+
+    TagIds догружаются одним IN-запросом на пачку через отдельную сессию tags_db:
+    пока основной курсор открыт, соединение занято (в SQL Server без MARS).
+    """
+    columns = [getattr(models.Article, name) for name in EXPORT_COLUMNS]
+    query = _filter_articles(db.query(*columns), status_id, tag_id, date_from, date_to)
+    query = query.order_by(models.Article.ArticleId).yield_per(batch_size)
+    batch = []
+    for row in query:
+        batch.append(dict(zip(EXPORT_COLUMNS, row)))
+        if len(batch) >= batch_size:
+            yield _attach_tag_ids(tags_db, batch)
+            batch = []
+    if batch:
+        yield _attach_tag_ids(tags_db, batch)
+
+def _attach_tag_ids(db: Session, batch: List[dict]) -> List[dict]:
+    by_id = {item["ArticleId"]: item for item in batch}
+    for item in batch:
+        item["TagIds"] = []
+    rows = db.query(models.article_tag.c.ArticleId, models.article_tag.c.TagId).filter(
+        models.article_tag.c.ArticleId.in_(list(by_id))
+    )
+    for article_id, tag_id in rows:
+        by_id[article_id]["TagIds"].append(tag_id)
+    return batch
 
 def get_tags(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Tag).order_by(models.Tag.TagId).offset(skip).limit(limit).all()
 
+def create_tag(db: Session, name: str):
+    db_tag = models.Tag(Name=name)
+    db.add(db_tag)
+    db.commit()
+    db.refresh(db_tag)
+    reference_cache.invalidate("tags")
+    bitmap.add_tag(db_tag.TagId, db_tag.Name)
+    return db_tag
+
+def get_genders(db: Session):
+    return db.query(models.Gender).order_by(models.Gender.GenderId).all()
+
+def get_statuses(db: Session):
+    return db.query(models.ArticleStatus).order_by(models.ArticleStatus.StatusId).all()
+
 def get_article(db: Session, article_id: int):
-    return db.query(models.Article).filter(models.Article.ArticleId == article_id).first()
+    return (
+        db.query(models.Article)
+        .options(*article_load_options())
+        .filter(models.Article.ArticleId == article_id)
+        .first()
+    )
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_MARKDOWN_RE = re.compile(r"!?\[([^\]]*)\]\([^)]*\)|[#*_`>~|]+")
+_SPACE_RE = re.compile(r"\s+")
+
+def make_excerpt(body: Optional[str], limit: Optional[int] = None) -> Optional[str]:
+    """Начало текста без HTML/markdown-разметки, обрезанное по слову (колонка Excerpt)."""
+    if body is None:
+        return None
+    # Excerpt — String(300): многоточие тоже помещается
+    limit = min(limit or settings.EXCERPT_LENGTH, 299)
+    text = _MARKDOWN_RE.sub(lambda m: m.group(1) or "", _TAG_RE.sub(" ", body[:limit * 4]))
+    text = _SPACE_RE.sub(" ", text).strip()
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    space = cut.rfind(" ")
+    if space > limit // 2:
+        cut = cut[:space]
+    return cut.rstrip(" ,.;:-—") + "…"
 
 def create_article(db: Session, article: schemas.ArticleCreate, author_id: int):
+    """Статья и её теги одной транзакцией; неизвестные TagIds или StatusId — ValueError."""
+    tag_ids = _validate_tag_ids(db, article.TagIds or ())
+    _validate_status_id(db, article.StatusId)
     db_article = models.Article(
         AuthorId=author_id,
-        Title=article.title,
-        Body=article.body,
-        StatusId=article.status_id
+        Title=article.Title,
+        Body=article.Body,
+        Excerpt=make_excerpt(article.Body),
+        StatusId=article.StatusId,
+        Image=article.Image
     )
     db.add(db_article)
+    db.flush()
+    _sync_article_tags(db, db_article.ArticleId, tag_ids, current=set())
     db.commit()
     db.refresh(db_article)
+    search_index.index_article(db_article)
+    bitmap.index_article(db_article.ArticleId, db_article.StatusId, tag_ids)
+    invalidate_article(db_article.ArticleId)
+    events.article_created(db_article.ArticleId, db_article.StatusId, db_article.UpdatedAt or db_article.CreatedAt)
     return db_article
 
-def update_article(db: Session, article_id: int, article: schemas.ArticleUpdate):
-    db_article = db.query(models.Article).filter(models.Article.ArticleId == article_id).first()
-    if db_article:
-        for key, value in article.dict(exclude_unset=True).items():
-            setattr(db_article, key, value)
-        db_article.UpdatedAt = db.query(models.func.sysutcdatetime()).scalar()
-        db.commit()
-        db.refresh(db_article)
-    return db_article
+def get_existing_tag_ids(db: Session, tag_ids: Iterable[int]) -> Set[int]:
+    tag_ids = set(tag_ids)
+    if not tag_ids:
+        return set()
+    return {row[0] for row in db.query(models.Tag.TagId).filter(models.Tag.TagId.in_(tag_ids))}
+
+def _validate_tag_ids(db: Session, tag_ids: Iterable[int]) -> Set[int]:
+    # Один IN-запрос на весь список вместо SELECT на каждый тег
+    tag_ids = set(tag_ids)
+    unknown = tag_ids - get_existing_tag_ids(db, tag_ids)
+    if unknown:
+        raise ValueError(f"Неизвестные TagIds: {sorted(unknown)}")
+    return tag_ids
+
+def _sync_article_tags(db: Session, article_id: int, tag_ids: Set[int],
+                       current: Optional[Set[int]] = None) -> Tuple[Set[int], Set[int]]:
+    """Приводит ArticleTag статьи к tag_ids разницей множеств, без коммита.
+
+    Не больше одного DELETE ... IN и одного INSERT executemany; current — уже
+    известные теги статьи (для новой — пустое множество), иначе читаются из БД.
+    Возвращает (добавленные, удалённые).
+    """
+    link = models.article_tag.c
+    if current is None:
+        current = {row[0] for row in db.query(link.TagId).filter(link.ArticleId == article_id)}
+    added, removed = tag_ids - current, current - tag_ids
+    if removed:
+        db.execute(delete(models.article_tag).where(link.ArticleId == article_id, link.TagId.in_(removed)))
+    if added:
+        db.execute(insert(models.article_tag), [{"ArticleId": article_id, "TagId": t} for t in sorted(added)])
+    return added, removed
+
+def _existing_status_ids(db: Session, status_ids: Iterable[int]) -> Set[int]:
+    status_ids = set(status_ids)
+    if not status_ids:
+        return set()
+    return {
+        row[0] for row in
+        db.query(models.ArticleStatus.StatusId).filter(models.ArticleStatus.StatusId.in_(status_ids))
+    }
+
+def _validate_status_id(db: Session, status_id: int) -> None:
+    # Иначе неизвестный статус дойдёт до внешнего ключа и вернётся как 500
+    if status_id not in _existing_status_ids(db, (status_id,)):
+        raise ValueError(f"Неизвестный StatusId: {status_id}")
 
-def delete_article(db: Session, article_id: int):
-    db_article = db.query(models.Article).filter(models.Article.ArticleId == article_id).first()
-    if db_article:
-        db.delete(db_article)
+def bulk_create_articles(db: Session, items: List[Tuple[int, schemas.ArticleCreate]], author_id: int):
+    """Вставляет пачку статей одной транзакцией: INSERT статей executemany-пакетом
+    (с OUTPUT/RETURNING ArticleId) и INSERT в ArticleTag через fast_executemany.
+
+    items — пары (номер во входном потоке, статья). Возвращает результат по каждому номеру.
+    """
+    results = []
+    tag_ids = get_existing_tag_ids(db, (t for _, a in items for t in (a.TagIds or [])))
+    status_ids = _existing_status_ids(db, (a.StatusId for _, a in items))
+    valid = []
+    for index, article in items:
+        unknown = set(article.TagIds or []) - tag_ids
+        if unknown:
+            results.append({"index": index, "status": "error", "error": f"Неизвестные TagIds: {sorted(unknown)}"})
+        elif article.StatusId not in status_ids:
+            results.append({"index": index, "status": "error", "error": f"Неизвестный StatusId: {article.StatusId}"})
+        else:
+            valid.append((index, article))
+    if not valid:
+        return results
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            "AuthorId": author_id,
+            "Title": article.Title,
+            "Body": article.Body,
+            "Excerpt": make_excerpt(article.Body),
+            "Image": article.Image,
+            "StatusId": article.StatusId,
+            "CreatedAt": now,
+            "UpdatedAt": now,
+        }
+        for _, article in valid
+    ]
+    try:
+        article_ids = db.scalars(
+            insert(models.Article).returning(models.Article.ArticleId, sort_by_parameter_order=True),
+            rows,
+        ).all()
+        tag_rows = [
+            {"ArticleId": article_id, "TagId": tag_id}
+            for article_id, (_, article) in zip(article_ids, valid)
+            for tag_id in set(article.TagIds or [])
+        ]
+        if tag_rows:
+            db.execute(insert(models.article_tag), tag_rows)
         db.commit()
-    return db_article
+    except SQLAlchemyError as exc:
+        db.rollback()
+        error = f"Ошибка БД: {exc.__class__.__name__}"
+        results.extend({"index": index, "status": "error", "error": error} for index, _ in valid)
+        return results
+
+    for article_id, (index, article) in zip(article_ids, valid):
+        search_index.index_fields(article_id, article.Title, article.Body)
+        bitmap.index_article(article_id, article.StatusId, article.TagIds or ())
+        events.article_created(article_id, article.StatusId, now)
+        results.append({"index": index, "status": "created", "ArticleId": article_id})
+    invalidate_article()
+    return results
+
+def _version_filter(versions: List[Optional[datetime]]):
+    # Версия строки — та же метка, что в ETag (version_etag): UpdatedAt, а для старых строк CreatedAt
+    version = func.coalesce(models.Article.UpdatedAt, models.Article.CreatedAt)
+    dates = [v for v in versions if v is not None]
+    clauses = [version.in_(dates)] if dates else []
+    if None in versions:
+        clauses.append(version.is_(None))
+    return or_(*clauses) if clauses else false()
+
+def article_exists(db: Session, article_id: int) -> bool:
+    return db.query(models.Article.ArticleId).filter(models.Article.ArticleId == article_id).first() is not None
+
+_NOT_NULL_FIELDS = ("Title", "Body", "StatusId")
+
+def get_article_dto(db: Session, article_id: int) -> Optional[dict]:
+    rows = _article_row_query(db).filter(models.Article.ArticleId == article_id).all()
+    return _article_dtos(db, rows)[0] if rows else None
+
+def update_article(db: Session, article_id: int, article: schemas.ArticleUpdate,
+                   versions: Optional[List[Optional[datetime]]] = None):
+    """Один UPDATE ... OUTPUT/RETURNING без предварительного SELECT.
+
+    versions — допустимые версии из If-Match (None — без проверки). Возвращает
+    (DTO статьи, UpdatedAt) новой версии или None, если строки нет или версия
+    не совпала (конкурентная правка) — различает их роутер. TagIds, если
+    переданы, заменяют набор тегов в той же транзакции. Неизвестные TagIds или
+    StatusId и явный null в Title, Body, StatusId — ValueError.
+    """
+    values = article.dict(exclude_unset=True, exclude={"TagIds"})
+    nulls = [name for name in _NOT_NULL_FIELDS if name in values and values[name] is None]
+    if nulls:
+        raise ValueError(f"Поля не могут быть null: {', '.join(nulls)}")
+    tag_ids = None
+    if "TagIds" in article.model_fields_set and article.TagIds is not None:
+        tag_ids = _validate_tag_ids(db, article.TagIds)
+    status_id = values.pop("StatusId", None)
+    if status_id is not None:
+        _validate_status_id(db, status_id)
+    if "Body" in values:
+        values["Excerpt"] = make_excerpt(values["Body"])
+    values["UpdatedAt"] = datetime.utcnow()
+    stmt = update(models.Article).where(models.Article.ArticleId == article_id)
+    if versions is not None:
+        stmt = stmt.where(_version_filter(versions))
+    stmt = stmt.values(**values).returning(models.Article.ArticleId, models.Article.UpdatedAt)
+    row = db.execute(stmt, execution_options={"synchronize_session": False}).first()
+    if row is None:
+        db.rollback()
+        return None
+    status_changed = False
+    if status_id is not None:
+        # Статус — отдельным UPDATE с условием StatusId <> нового: строка находится, только
+        # если статус правда меняется, и из конкурентных правок её найдёт одна
+        status_changed = db.execute(
+            update(models.Article)
+            .where(models.Article.ArticleId == article_id, models.Article.StatusId != status_id)
+            .values(StatusId=status_id)
+            .returning(models.Article.ArticleId),
+            execution_options={"synchronize_session": False},
+        ).first() is not None
+    if tag_ids is not None:
+        _sync_article_tags(db, row.ArticleId, tag_ids)
+    db.commit()
+    # Одно чтение после коммита — и для поискового индекса, и для ответа роутера
+    dto = get_article_dto(db, row.ArticleId)
+    search_index.index_fields(row.ArticleId, dto["Title"], dto["Body"])
+    bitmap.index_article(row.ArticleId, dto["StatusId"], tag_ids)
+    invalidate_article(article_id)
+    events.article_updated(row.ArticleId, dto["StatusId"], row.UpdatedAt, status_changed=status_changed)
+    return dto, row.UpdatedAt
+
+def delete_article(db: Session, article_id: int, versions: Optional[List[Optional[datetime]]] = None) -> bool:
+    """DELETE связей и статьи одной транзакцией, без загрузки строки (и блобов).
+
+    False — строки нет или версия из If-Match не совпала.
+    """
+    db.execute(delete(models.article_tag).where(models.article_tag.c.ArticleId == article_id))
+    stmt = delete(models.Article).where(models.Article.ArticleId == article_id)
+    if versions is not None:
+        stmt = stmt.where(_version_filter(versions))
+    deleted = db.execute(
+        stmt.returning(models.Article.ArticleId), execution_options={"synchronize_session": False}
+    ).first()
+    if deleted is None:
+        # Статья не удалена — возвращаем и её теги
+        db.rollback()
+        return False
+    db.commit()
+    search_index.remove_article(article_id)
+    bitmap.remove_article(article_id)
+    invalidate_article(article_id)
+    events.article_deleted(article_id)
+    return True
+
+def add_article_counters(db: Session, deltas: Dict[int, Tuple[int, int]]) -> int:
+    """Прибавляет (просмотры, скачивания) к ArticleCounter одной транзакцией.
+
+    Один SELECT ... IN отсекает удалённые статьи, дальше пакетный upsert:
+    MERGE в SQL Server, INSERT ... ON CONFLICT в SQLite/PostgreSQL. Возвращает
+    число записанных статей. Размер deltas ограничивает вызывающий
+    (app.counters.flush): id уходят в IN параметрами.
+    """
+    existing = {
+        row[0] for row in
+        db.query(models.Article.ArticleId).filter(models.Article.ArticleId.in_(list(deltas)))
+    }
+    now = datetime.utcnow()
+    rows = [
+        {"ArticleId": article_id, "Views": views, "Downloads": downloads, "UpdatedAt": now}
+        for article_id, (views, downloads) in sorted(deltas.items())
+        if article_id in existing
+    ]
+    if not rows:
+        return 0
+    dialect = db.get_bind().dialect.name
+    counter = models.ArticleCounter.__table__
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        stmt = upsert(counter)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[counter.c.ArticleId],
+            set_={
+                "Views": counter.c.Views + stmt.excluded.Views,
+                "Downloads": counter.c.Downloads + stmt.excluded.Downloads,
+                "UpdatedAt": stmt.excluded.UpdatedAt,
+            },
+        )
+        db.execute(stmt, rows)
+    else:
+        # HOLDLOCK: без него два воркера могут одновременно не найти строку и оба вставить её
+        db.execute(text(
+            'MERGE "ArticleCounter" WITH (HOLDLOCK) AS t '
+            "USING (SELECT :ArticleId AS ArticleId, :Views AS Views, :Downloads AS Downloads) AS s "
+            "ON t.ArticleId = s.ArticleId "
+            "WHEN MATCHED THEN UPDATE SET Views = t.Views + s.Views, Downloads = t.Downloads + s.Downloads, "
+            "UpdatedAt = :UpdatedAt "
+            "WHEN NOT MATCHED THEN INSERT (ArticleId, Views, Downloads, UpdatedAt) "
+            "VALUES (s.ArticleId, s.Views, s.Downloads, :UpdatedAt);"
+        ), rows)
+    db.commit()
+    return len(rows)
 
-# Вспомогательная функция для хеширования паролей
-def hash_password(password: str) -> str:
-    import hashlib
-    return hashlib.sha256(password.encode()).hexdigest().upper()
\ No newline at end of file
+def get_articles_by_ids(db: Session, article_ids: List[int], fields: Optional[Tuple[str, ...]] = None) -> List[dict]:
+    """DTO статей в порядке article_ids (удалённые пропускаются)."""
+    return _hydrate_page(db, article_ids, True, fields)
@@ -1,19 +1,238 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import itertools
+import threading
+import time
+from typing import Iterable, Optional
+
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql import Select
+from starlette.concurrency import run_in_threadpool
+
+from app.cache import LRUCache
+from app.config import settings
+from app.metrics import TimedQueuePool
+
+DATABASE_URL = settings.DATABASE_URL
+
+# Синхронный драйвер -> асинхронный для того же сервера
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "mssql+pyodbc": "mssql+aioodbc",
+}
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    url_obj = make_url(url)
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING, "echo": settings.DB_ECHO}
+    if url_obj.get_backend_name() == "sqlite":
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}
+        if url_obj.database in (None, "", ":memory:"):
+            # Одна in-memory база на процесс, пул не нужен
+            options["poolclass"] = StaticPool
+            return options
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    if not is_async:
+        # Тот же QueuePool, но с замером ожидания соединения
+        options["poolclass"] = TimedQueuePool
+    if url_obj.drivername == "mssql+pyodbc":
+        options["fast_executemany"] = True
+    return options
+
+
+class ReplicaSet:
+    """Реплики для чтения: round-robin по здоровым; после обрыва или отказа
+    соединения реплика пропускается REPLICA_RETRY_SECONDS."""
+
+    def __init__(self, engines: Iterable[Engine]):
+        self.engines = list(engines)
+        self._down = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        for replica in self.engines:
+            event.listen(replica, "handle_error", self._on_error)
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def pick(self) -> Optional[Engine]:
+        now = time.monotonic()
+        start = next(self._counter)
+        for i in range(len(self.engines)):
+            replica = self.engines[(start + i) % len(self.engines)]
+            if self._down.get(replica, 0.0) <= now:
+                return replica
+        return None
+
+    def mark_down(self, replica: Engine) -> None:
+        with self._lock:
+            self._down[replica] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+
+    def _on_error(self, context) -> None:
+        if context.is_disconnect or context.connection is None:
+            self.mark_down(context.engine)
+
+
+class RoutingSession(Session):
+    """Session, выбирающая движок на каждый запрос.
+
+    Запись (flush, INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE) — всегда primary,
+    после первой записи вся сессия остаётся на primary. Чтение — реплика,
+    выбранная один раз на сессию (один снимок на HTTP-запрос). Если реплик нет
+    или все недоступны — primary.
+    """
+
+    primary: Engine = None
+    replicas: ReplicaSet = ReplicaSet(())
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if not self.replicas or self._flushing or self.info.get("primary"):
+            return self.primary
+        if not isinstance(clause, Select) or clause._for_update_arg is not None:
+            return self.primary
+        replica = self.info.get("replica")
+        if replica is None:
+            replica = self.replicas.pick()
+            if replica is None:
+                return self.primary
+            self.info["replica"] = replica
+        return replica
+
+
+def routing_session_class(primary: Engine, replicas: Iterable[Engine]) -> type:
+    return type("RoutingSession", (RoutingSession,), {"primary": primary, "replicas": ReplicaSet(replicas)})
+
+
+# Клиенты, недавно писавшие в БД (ключ — client_key): читают с primary, пока реплика догоняет
+_recent_writers = LRUCache(10000, settings.REPLICA_STICKY_SECONDS)
+
+
+def client_key(request: Request) -> str:
+    # Токен, если есть, иначе адрес: регистрация и следующий за ней логин идут без токена
+    return request.headers.get("authorization") or (request.client.host if request.client else "")
+
+
+def use_primary(db) -> None:
+    """Все запросы сессии — на primary (например, чтение перед записью в CLI)."""
+    db.info["primary"] = True
 
-DATABASE_URL = (
-    "mssql+pyodbc://"
-    "@DESKTOP-VO4BHVT\\SQLEXPRESS/MicrocontrollersNews"
-    "?driver=ODBC+Driver+17+for+SQL+Server&trusted_connection=yes"
-)
 
-engine = create_engine(DATABASE_URL, fast_executemany=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+def pinned_to_primary(db) -> bool:
+    """Сессия читает с primary с самого начала: запрос на запись или клиент в окне read-your-writes."""
+    return bool(db.info.get("primary"))
+
+
+def read_from_primary(db) -> bool:
+    """Ни одно чтение сессии не ушло на реплику (реплик нет, все недоступны или сессия на primary)."""
+    return db.info.get("replica") is None
+
+
+def route_session(db, request: Request) -> None:
+    """Не-GET запросы и клиенты из окна read-your-writes читают с primary."""
+    if not replica_engines:
+        return
+    key = client_key(request)
+    db.info["client"] = key
+    if request.method not in ("GET", "HEAD") or _recent_writers.get(key):
+        use_primary(db)
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_write_statement(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["primary"] = True
+        state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_flush(session, flush_context):
+    session.info["primary"] = True
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _remember_writer(session):
+    if session.info.pop("wrote", False) and session.info.get("client"):
+        _recent_writers.set(session.info["client"], True)
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+replica_engines = [create_engine(url, **engine_options(url)) for url in settings.REPLICA_DATABASE_URLS]
+SessionLocal = sessionmaker(
+    class_=routing_session_class(engine, replica_engines), autoflush=False, autocommit=False
+)
 Base = declarative_base()
 
-def get_db():
+def get_db(request: Request):
     db = SessionLocal()
+    route_session(db, request)
     try:
         yield db
     finally:
         db.close()
+
+
+def async_database_url(url: Optional[str] = None) -> str:
+    if url is None:
+        if settings.ASYNC_DATABASE_URL:
+            return settings.ASYNC_DATABASE_URL
+        url = DATABASE_URL
+    url_obj = make_url(url)
+    driver = _ASYNC_DRIVERS.get(url_obj.drivername)
+    if driver is None:
+        raise RuntimeError(f"Нет асинхронного драйвера для {url_obj.drivername}, задайте ASYNC_DATABASE_URL")
+    return url_obj.set(drivername=driver).render_as_string(hide_password=False)
+
+
+async_engine = None
+async_replica_engines = []
+AsyncSessionLocal = None
+
+if settings.ASYNC_DB_ENABLED:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    _async_url = async_database_url()
+    async_engine = create_async_engine(_async_url, **engine_options(_async_url, is_async=True))
+    async_replica_engines = [
+        create_async_engine(url, **engine_options(url, is_async=True))
+        for url in map(async_database_url, settings.REPLICA_DATABASE_URLS)
+    ]
+    # expire_on_commit=False: после commit атрибуты не должны догружаться лениво вне greenlet
+    AsyncSessionLocal = async_sessionmaker(
+        autoflush=False, expire_on_commit=False,
+        sync_session_class=routing_session_class(
+            async_engine.sync_engine, [e.sync_engine for e in async_replica_engines]
+        ),
+    )
+
+
+async def get_async_db(request: Request):
+    """Сессия для async-роутов: AsyncSession, если включён ASYNC_DB_ENABLED,
+    иначе обычная Session (запросы тогда уходят в threadpool через run_sync)."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            route_session(db, request)
+            yield db
+        return
+    db = SessionLocal()
+    route_session(db, request)
+    try:
+        yield db
+    finally:
+        await run_in_threadpool(db.close)
+
+
+async def run_sync(db, fn, *args, **kwargs):
+    """Выполняет синхронную функцию crud с сессией из get_async_db, не блокируя event loop."""
+    if AsyncSessionLocal is not None:
+        return await db.run_sync(lambda session: fn(session, *args, **kwargs))
+    return await run_in_threadpool(fn, db, *args, **kwargs)
@@ -0,0 +1,180 @@
+"""Лента изменений статей для Server-Sent Events (GET /articles/changes).
+
+crud после коммита публикует событие (created / updated / published /
+deleted) в общий кольцевой буфер последних EVENTS_REPLAY_SIZE событий. Кадр
+SSE форматируется один раз при публикации и отдаётся всем подписчикам как
+есть.
+
+У подписчика нет своей очереди — только номер последнего отданного события.
+Простаивающие подписчики одного event loop ждут общий future, который
+публикация будит через call_soon_threadsafe (crud работает в threadpool).
+Медленный клиент тормозит только свой поток: если он отстал больше чем на
+буфер, получает ``event: reset`` и должен перечитать список статей.
+
+Номера событий локальны для процесса, поэтому id содержит эпоху воркера:
+Last-Event-ID от другого воркера (или до перезапуска) тоже даёт reset.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+
+from app import metrics
+from app.config import settings
+from app.serialization import dump_json
+from app.utils.http import version_etag
+
+# StatusId "Published" из справочника (см. SEED_DATA в app.cli)
+PUBLISHED_STATUS_ID = 2
+
+
+class ChangeEvent(NamedTuple):
+    seq: int
+    frame: bytes
+
+
+def _resolve(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class ChangeFeed:
+    def __init__(self, replay_size: int):
+        self.epoch = f"{os.getpid():x}{int(time.time()):x}"
+        self.subscribers = 0
+        self.closed = False
+        self._events: "deque[ChangeEvent]" = deque(maxlen=max(replay_size, 1))
+        self._seq = 0
+        self._lock = threading.Lock()
+        # Один future на event loop: его ждут все простаивающие подписчики этого loop
+        self._waiters: Dict[asyncio.AbstractEventLoop, asyncio.Future] = {}
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def parse_id(self, last_event_id: Optional[str]) -> Optional[int]:
+        """Номер из Last-Event-ID этого воркера; None — чужой или битый id."""
+        epoch, _, seq = (last_event_id or "").strip().rpartition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        return seq if seq <= self._seq else None
+
+    def publish(self, kind: str, data: dict) -> None:
+        with self._lock:
+            self._seq += 1
+            frame = b"id: %s\nevent: %s\ndata: %s\n\n" % (
+                self.event_id(self._seq).encode(), kind.encode(), dump_json(data)
+            )
+            self._events.append(ChangeEvent(self._seq, frame))
+            waiters, self._waiters = self._waiters, {}
+        metrics.changefeed_events.inc(kind)
+        for loop, waiter in waiters.items():
+            try:
+                loop.call_soon_threadsafe(_resolve, waiter)
+            except RuntimeError:
+                pass  # loop уже закрыт
+
+    def since(self, seq: int) -> Tuple[List[ChangeEvent], bool]:
+        """События после seq и признак того, что часть из них уже вытеснена из буфера."""
+        with self._lock:
+            if seq >= self._seq:
+                return [], False
+            oldest = self._events[0].seq
+            if seq < oldest - 1:
+                return [], True
+            return list(islice(self._events, seq - oldest + 1, None)), False
+
+    async def wait(self, seq: int, timeout: float) -> bool:
+        """Ждёт событие новее seq; False — истёк timeout."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._seq > seq or self.closed:
+                return True
+            waiter = self._waiters.get(loop)
+            if waiter is None:
+                waiter = self._waiters[loop] = loop.create_future()
+        try:
+            # shield: таймаут одного подписчика не должен отменять общий future
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def close(self) -> None:
+        """Завершает все потоки (остановка приложения)."""
+        with self._lock:
+            self.closed = True
+            waiters, self._waiters = self._waiters, {}
+        for loop, waiter in waiters.items():
+            try:
+                loop.call_soon_threadsafe(_resolve, waiter)
+            except RuntimeError:
+                pass
+
+    def _reset_frame(self, reason: str) -> bytes:
+        # id — текущая голова: после перечитывания списка клиент продолжает с неё
+        return b"id: %s\nevent: reset\ndata: %s\n\n" % (
+            self.event_id(self._seq).encode(), dump_json({"reason": reason})
+        )
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Тело SSE-ответа; без Last-Event-ID — только новые события."""
+        with self._lock:
+            self.subscribers += 1
+        try:
+            yield b"retry: %d\n\n" % (settings.EVENTS_RETRY_MS,)
+            seq = self._seq
+            if last_event_id:
+                resumed = self.parse_id(last_event_id)
+                if resumed is None:
+                    yield self._reset_frame("unknown-id")
+                else:
+                    seq = resumed
+            while not self.closed:
+                events, lost = self.since(seq)
+                if lost:
+                    seq = self._seq
+                    yield self._reset_frame("lagging")
+                elif events:
+                    # Всё накопленное — одной записью в сокет
+                    seq = events[-1].seq
+                    yield b"".join(event.frame for event in events)
+                elif not await self.wait(seq, settings.EVENTS_HEARTBEAT_SECONDS):
+                    # Комментарий SSE держит соединение живым через прокси
+                    yield b": ping\n\n"
+        finally:
+            with self._lock:
+                self.subscribers -= 1
+
+
+feed = ChangeFeed(settings.EVENTS_REPLAY_SIZE)
+metrics.registry.add_collector(lambda: metrics.changefeed_subscribers.set(value=feed.subscribers))
+
+
+def _payload(article_id: int, status_id: Optional[int] = None, version=None) -> dict:
+    # ETag той же версии, что отдаёт GET /articles/{id}: клиент может сразу прислать его в If-Match
+    data = {"ArticleId": article_id, "StatusId": status_id}
+    if status_id is not None:
+        data["ETag"] = version_etag(article_id, version)
+    return data
+
+
+def article_created(article_id: int, status_id: int, version=None) -> None:
+    feed.publish("created", _payload(article_id, status_id, version))
+    if status_id == PUBLISHED_STATUS_ID:
+        feed.publish("published", _payload(article_id, status_id, version))
+
+
+def article_updated(article_id: int, status_id: int, version=None, status_changed: bool = False) -> None:
+    """status_changed — правка действительно сменила StatusId: переход в Published даёт ещё и published."""
+    feed.publish("updated", _payload(article_id, status_id, version))
+    if status_changed and status_id == PUBLISHED_STATUS_ID:
+        feed.publish("published", _payload(article_id, status_id, version))
+
+
+def article_deleted(article_id: int) -> None:
+    feed.publish("deleted", _payload(article_id))
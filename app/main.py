@@ -1,19 +1,48 @@
 # app/main.py
 
 from fastapi import FastAPI
-from app.database import engine, Base
+from fastapi.responses import PlainTextResponse
+from app.config import settings
+from app.database import engine, async_engine, replica_engines, async_replica_engines
+from app import metrics
+from app.admission import AdmissionMiddleware
+from app.compression import CompressionMiddleware
+from app.serialization import ORJSONResponse
 from app.routers import auth, users, articles, tags, statuses, genders
 
-Base.metadata.create_all(bind=engine)
-
+# Схема и начальные данные создаются командой python -m app.cli init-db:
+# импорт приложения к БД не обращается
 app = FastAPI(
     title="Microcontrollers News API",
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
-    openapi_url="/openapi.json"
+    openapi_url="/openapi.json",
+    default_response_class=ORJSONResponse
 )
 
+# Сжатие — самый внутренний слой: метрики видят время вместе с ним
+if settings.RESPONSE_COMPRESSION:
+    app.add_middleware(CompressionMiddleware)
+
+# Допуск добавляется раньше метрик: отказы 429/503 тоже попадают в http_requests_total
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
+
+if settings.METRICS_ENABLED:
+    metrics.instrument_engine(engine, "primary", settings.SLOW_QUERY_MS)
+    if async_engine is not None:
+        metrics.instrument_engine(async_engine.sync_engine, "async", settings.SLOW_QUERY_MS)
+    for i, replica in enumerate(replica_engines):
+        metrics.instrument_engine(replica, f"replica{i}", settings.SLOW_QUERY_MS)
+    for i, replica in enumerate(async_replica_engines):
+        metrics.instrument_engine(replica.sync_engine, f"async_replica{i}", settings.SLOW_QUERY_MS)
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def read_metrics():
+        return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 app.include_router(auth.router,     prefix="/auth")
 app.include_router(users.router,    prefix="/users")
 app.include_router(articles.router)
@@ -22,51 +51,24 @@ app.include_router(statuses.router, prefix="/statuses")
 app.include_router(genders.router,  prefix="/genders")
 
 
-from sqlalchemy.orm import Session
-from app.database import SessionLocal
-from app import crud, models
-from datetime import date
+from app import bitmap, counters, events, search
+from app import pdf as pdf_export
+from app.utils.security import shutdown_hash_pool
+
 
 @app.on_event("startup")
-def seed_initial_data():
-    db: Session = SessionLocal()
-    try:
-        # Seed genders
-        if db.query(models.Gender).count() == 0:
-            db.add_all([
-                models.Gender(GenderId=1, Name="Male"),
-                models.Gender(GenderId=2, Name="Female"),
-            ])
-            db.commit()
-        # Seed statuses
-        if db.query(models.ArticleStatus).count() == 0:
-            db.add_all([
-                models.ArticleStatus(StatusId=1, Name="Draft"),
-                models.ArticleStatus(StatusId=2, Name="Published")
-            ])
-            db.commit()
-        # Seed tags
-        if db.query(models.Tag).count() == 0:
-            db.add_all([
-                models.Tag(TagId=1, Name="ESP32"),
-                models.Tag(TagId=2, Name="STM32"),
-                models.Tag(TagId=3, Name="Raspberry Pi")
-            ])
-            db.commit()
-        # Seed demo user
-        if db.query(models.User).count() == 0:
-            demo = models.User(
-                UserId=1,
-                FirstName="Иван",
-                LastName="Иванов",
-                MiddleName=None,
-                BirthDate=date(1990,1,1),
-                GenderId=1,
-                Email="ivan@example.com",
-                Login="ivan",
-                PasswordHash="hash",
-                Photo=None
-            )
-            db.add(demo); db.commit()
-    finally:
-        db.close()
\ No newline at end of file
+def warm_indexes():
+    # Битовый и поисковый индексы строятся в фоне: воркер принимает запросы сразу
+    if settings.BITMAP_WARMUP:
+        bitmap.refresh_in_background()
+    if settings.SEARCH_WARMUP:
+        search.refresh_in_background()
+    counters.start()
+
+
+@app.on_event("shutdown")
+def stop_worker_pools():
+    events.feed.close()
+    counters.stop()
+    pdf_export.shutdown()
+    shutdown_hash_pool()
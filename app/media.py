@@ -0,0 +1,141 @@
+"""Отдача блобов (Article.Image, User.Photo): Range, ETag по содержимому, миниатюры."""
+import hashlib
+import re
+from io import BytesIO
+from typing import Callable, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.cache import media_cache, thumbnail_cache
+from app.config import settings
+from app.utils.http import is_not_modified
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+
+
+class MediaEntry(NamedTuple):
+    data: bytes
+    etag: str
+    media_type: str
+
+
+def sniff_media_type(data: bytes) -> str:
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, media_type in _SIGNATURES:
+        if data.startswith(signature):
+            return media_type
+    return "application/octet-stream"
+
+
+def make_entry(data: bytes) -> MediaEntry:
+    return MediaEntry(data, '"' + hashlib.sha256(data).hexdigest()[:32] + '"', sniff_media_type(data))
+
+
+def load_entry(key: Tuple[str, int], row) -> MediaEntry:
+    """row — результат crud.get_*_image/photo: None (нет записи) или (bytes|None,)."""
+    if row is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Не найдено")
+    if row[0] is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Изображение отсутствует")
+    entry = make_entry(bytes(row[0]))
+    if len(entry.data) <= settings.MEDIA_CACHE_MAX_BYTES:
+        media_cache.set(key, entry)
+    return entry
+
+
+def thumbnail(entry: MediaEntry, width: int) -> MediaEntry:
+    key = (entry.etag, width)
+    cached = thumbnail_cache.get(key)
+    if cached is not None:
+        return cached
+    from PIL import Image
+
+    with Image.open(BytesIO(entry.data)) as img:
+        if img.width <= width:
+            return entry
+        height = max(1, round(img.height * width / img.width))
+        resized = img.resize((width, height), Image.LANCZOS)
+        fmt = img.format if img.format in ("PNG", "GIF", "WEBP") else "JPEG"
+        if fmt == "JPEG" and resized.mode not in ("RGB", "L"):
+            resized = resized.convert("RGB")
+        out = BytesIO()
+        resized.save(out, format=fmt)
+    thumb = make_entry(out.getvalue())
+    thumbnail_cache.set(key, thumb)
+    return thumb
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Один диапазон bytes=a-b -> (start, end) включительно; None — отдать целиком."""
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        # Несколько диапазонов и прочие формы не поддерживаем — RFC разрешает отдать 200
+        return None
+    first, last = match.groups()
+    if first == "":
+        length = int(last)
+        if length == 0:
+            raise HTTPException(416,
+                                headers={"Content-Range": f"bytes */{size}"})
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(416,
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def _iter(data: bytes, start: int, end: int):
+    view = memoryview(data)
+    for pos in range(start, end + 1, CHUNK_SIZE):
+        yield bytes(view[pos:min(pos + CHUNK_SIZE, end + 1)])
+
+
+def media_response(request: Request, entry: MediaEntry) -> Response:
+    headers = {"ETag": entry.etag, "Accept-Ranges": "bytes", "Cache-Control": "no-cache"}
+    if is_not_modified(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    size = len(entry.data)
+    byte_range = None
+    range_header = request.headers.get("range")
+    # If-Range: диапазон только для той же версии, иначе весь файл
+    if range_header and request.headers.get("if-range", entry.etag) == entry.etag:
+        byte_range = parse_range(range_header, size)
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(_iter(entry.data, 0, size - 1), media_type=entry.media_type, headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _iter(entry.data, start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=entry.media_type,
+        headers=headers,
+    )
+
+
+async def serve(request: Request, key: Tuple[str, int], fetch: Callable, width: Optional[int]) -> Response:
+    """Общий обработчик: кэш блоба -> БД (fetch) -> миниатюра -> ответ с Range/ETag."""
+    entry = media_cache.get(key)
+    if entry is None:
+        entry = load_entry(key, await fetch())
+    if width:
+        if not entry.media_type.startswith("image/"):
+            raise HTTPException(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Миниатюра доступна только для изображений")
+        entry = await run_in_threadpool(thumbnail, entry, width)
+    return media_response(request, entry)
@@ -0,0 +1,324 @@
+"""Метрики в формате Prometheus: задержки по маршрутам, SQL на запрос, пул, threadpool.
+
+Счётчики SQL привязаны к запросу через contextvar: Starlette копирует контекст
+в threadpool, а AsyncSession.run_sync выполняется в той же задаче, так что
+запросы из crud попадают в статистику своего маршрута. Разница между
+длительностью запроса и временем SQL — это гидрация ORM и сериализация.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger("app.metrics")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield from self.header()
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, *labels: str, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> Iterable[str]:
+        yield from self.header()
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [счётчики по корзинам (+Inf последней), сумма, количество]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> Iterable[str]:
+        yield from self.header()
+        with self._lock:
+            items = [(labels, (list(s[0]), s[1], s[2])) for labels, s in self._values.items()]
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _labels(self.labelnames, labels, 'le="%s"' % le)
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn) -> None:
+        """fn() вызывается перед выдачей /metrics — для gauge, снимаемых в момент запроса."""
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        for collect in self._collectors:
+            try:
+                collect()
+            except Exception:  # сбор метрик не должен ронять /metrics
+                logger.exception("metrics collector failed")
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests", ("method", "route", "status")))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")))
+http_inflight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests being processed"))
+request_queries = registry.register(Histogram(
+    "http_request_db_queries", "SQL statements per request", ("route",), buckets=COUNT_BUCKETS))
+request_sql_time = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent in SQL per request", ("route",)))
+db_queries = registry.register(Counter(
+    "db_queries_total", "SQL statements executed", ("route",)))
+db_slow_queries = registry.register(Counter(
+    "db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS", ("route",)))
+pool_checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time waiting for a pooled connection", ("engine",)))
+pool_checked_out = registry.register(Gauge(
+    "db_pool_checked_out", "Connections currently checked out", ("engine",)))
+pool_size = registry.register(Gauge(
+    "db_pool_size", "Configured pool size", ("engine",)))
+pool_overflow = registry.register(Gauge(
+    "db_pool_overflow", "Connections above pool_size", ("engine",)))
+threadpool_busy = registry.register(Gauge(
+    "threadpool_busy_threads", "Worker threads in use (AnyIO default limiter)"))
+threadpool_size = registry.register(Gauge(
+    "threadpool_max_threads", "AnyIO default thread limiter size"))
+admission_in_flight = registry.register(Gauge(
+    "admission_in_flight", "Admitted requests running per route group", ("group",)))
+admission_rejected = registry.register(Counter(
+    "admission_rejected_total", "Requests shed by admission control", ("group", "reason")))
+counters_pending = registry.register(Gauge(
+    "article_counters_pending", "Articles with view/download counts not yet flushed"))
+counter_flushes = registry.register(Counter(
+    "article_counter_flushes_total", "Write-behind counter flushes", ("result",)))
+changefeed_subscribers = registry.register(Gauge(
+    "changefeed_subscribers", "Open /articles/changes SSE streams"))
+changefeed_events = registry.register(Counter(
+    "changefeed_events_total", "Article change events published", ("event",)))
+
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "sql_seconds")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.queries = 0
+        self.sql_seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        return route_template(self.scope)
+
+
+def route_template(scope: dict) -> str:
+    """Шаблон пути (/articles/{article_id}) для меток — без id, чтобы не плодить серии.
+
+    route.path у маршрутов из include_router в новых FastAPI не содержит
+    префикс, поэтому шаблон собирается из path и path_params.
+    """
+    if scope.get("route") is None:
+        return "unmatched"
+    params = {str(v): k for k, v in scope.get("path_params", {}).items()}
+    if not params:
+        return scope["path"]
+    return "/".join("{%s}" % params[s] if s in params else s for s in scope["path"].split("/"))
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_route() -> str:
+    stats = _current.get()
+    return stats.route if stats is not None else "background"
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool, замеряющий ожидание свободного соединения."""
+
+    metrics_label = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_wait.observe(self.metrics_label, value=time.perf_counter() - start)
+
+
+def instrument_engine(engine, label: str, slow_query_ms: float) -> None:
+    """Подписывается на события движка: число и время SQL на запрос, медленные запросы."""
+
+    # Начало — на контексте выполнения, а не в conn.info: after_cursor_execute при ошибке
+    # не вызывается, и отметка уходит вместе с контекстом, не копясь на соединении.
+    # Контекста нет только у служебных запросов диалекта — их время не меряем
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_metrics_start", None)
+        elapsed = time.perf_counter() - start if start is not None else 0.0
+        stats = _current.get()
+        route = stats.route if stats is not None else "background"
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_seconds += elapsed
+        db_queries.inc(route)
+        if elapsed * 1000 >= slow_query_ms:
+            db_slow_queries.inc(route)
+            logger.warning("slow query %.1f ms [%s] %s", elapsed * 1000, route, " ".join(statement.split())[:500])
+
+    pool = engine.pool
+    if isinstance(pool, TimedQueuePool):
+        pool.metrics_label = label
+
+    def _collect_pool():
+        if hasattr(pool, "checkedout"):
+            pool_checked_out.set(label, value=pool.checkedout())
+            pool_size.set(label, value=pool.size())
+            pool_overflow.set(label, value=max(pool.overflow(), 0))
+
+    registry.add_collector(_collect_pool)
+
+
+def _collect_threadpool():
+    from anyio import to_thread
+
+    limiter = to_thread.current_default_thread_limiter()
+    threadpool_busy.set(value=limiter.borrowed_tokens)
+    threadpool_size.set(value=limiter.total_tokens)
+
+
+registry.add_collector(_collect_threadpool)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: латентность по шаблону маршрута и SQL-статистика запроса."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        http_inflight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_inflight.dec()
+            route = stats.route
+            method = scope.get("method", "")
+            http_requests.inc(method, route, str(status_holder["status"]))
+            http_latency.observe(method, route, value=elapsed)
+            request_queries.observe(route, value=stats.queries)
+            request_sql_time.observe(route, value=stats.sql_seconds)
+            _current.reset(token)
@@ -1,9 +1,10 @@
 from sqlalchemy import (
     Column, Integer, String, Date, DateTime,
-    ForeignKey, Table, LargeBinary, Text
+    ForeignKey, Table, LargeBinary, Index
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
+from app.compression import CompressedText
 from app.database import Base
 
 class ArticleStatus(Base):
@@ -22,6 +23,8 @@ article_tag = Table(
     "ArticleTag", Base.metadata,
     Column("ArticleId", Integer, ForeignKey("Article.ArticleId"), primary_key=True),
     Column("TagId",    Integer, ForeignKey("Tag.TagId"),       primary_key=True),
+    # PK (ArticleId, TagId) не помогает фильтру по тегу — нужен обратный порядок
+    Index("IX_ArticleTag_TagId_ArticleId", "TagId", "ArticleId"),
 )
 
 class Tag(Base):
@@ -41,7 +44,8 @@ class User(Base):
     Email        = Column(String(100), nullable=False, unique=True)
     Login        = Column(String(50),  nullable=False, unique=True)
     PasswordHash = Column(String(255), nullable=False)
-    Photo        = Column(LargeBinary, nullable=True)
+    # Блобы не грузим вместе со строкой — их отдают /users/{id}/photo и /articles/{id}/image
+    Photo        = deferred(Column(LargeBinary, nullable=True))
     CreatedAt    = Column(DateTime, default=datetime.utcnow)
 
     Gender   = relationship("Gender", back_populates="Users")
@@ -52,8 +56,11 @@ class Article(Base):
     ArticleId = Column(Integer, primary_key=True, index=True)
     AuthorId  = Column(Integer, ForeignKey("User.UserId"), nullable=False)
     Title     = Column(String(100), nullable=False)
-    Body      = Column(Text, nullable=False)
-    Image     = Column(LargeBinary, nullable=True)
+    # Длинные тексты хранятся сжатыми (BODY_COMPRESSION), чтение прозрачно
+    Body      = Column(CompressedText, nullable=False)
+    # Начало текста без разметки для списков (view=card) — чтобы не читать и не отдавать Body
+    Excerpt   = Column(String(300), nullable=True)
+    Image     = deferred(Column(LargeBinary, nullable=True))
     StatusId  = Column(Integer, ForeignKey("ArticleStatus.StatusId"), nullable=False)
     CreatedAt = Column(DateTime, default=datetime.utcnow)
     UpdatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -61,3 +68,16 @@ class Article(Base):
     Author = relationship("User",          back_populates="Articles")
     Status = relationship("ArticleStatus", back_populates="Articles")
     Tags   = relationship("Tag", secondary=article_tag, back_populates="Articles")
+
+    __table_args__ = (
+        # Keyset-пагинация с фильтром по статусу: WHERE StatusId = ? AND ArticleId > ?
+        Index("IX_Article_StatusId_ArticleId", "StatusId", "ArticleId"),
+    )
+
+class ArticleCounter(Base):
+    # Просмотры и скачивания PDF: пишутся пачками из app.counters, а не UPDATE на каждый GET
+    __tablename__ = "ArticleCounter"
+    ArticleId = Column(Integer, ForeignKey("Article.ArticleId", ondelete="CASCADE"), primary_key=True)
+    Views     = Column(Integer, nullable=False, default=0)
+    Downloads = Column(Integer, nullable=False, default=0)
+    UpdatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,95 @@
+"""PDF для статей и профиля: рендер в ограниченном пуле процессов и кэш.
+
+Готовые PDF статей кэшируются по ключу (ArticleId, UpdatedAt): правка статьи
+меняет ключ, так что явная инвалидация не нужна. При ``PDF_WORKERS=0`` рендер
+идёт в threadpool (удобно для локальных прогонов).
+"""
+import asyncio
+import io
+import multiprocessing
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app import rendering
+from app.cache import LRUCache
+from app.config import settings
+
+pdf_cache = LRUCache(settings.PDF_CACHE_SIZE, settings.PDF_CACHE_TTL)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: fork процесса с потоками uvicorn/SQLAlchemy небезопасен
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.PDF_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _render(fn: Callable[..., bytes], *args) -> bytes:
+    if settings.PDF_WORKERS <= 0:
+        return await run_in_threadpool(fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+
+
+def article_payload(article) -> dict:
+    return {
+        "ArticleId": article.ArticleId,
+        "Title": article.Title,
+        "AuthorId": article.AuthorId,
+        "Body": article.Body,
+        "UpdatedAt": article.UpdatedAt or article.CreatedAt,
+    }
+
+
+async def article_pdf(payload: dict) -> bytes:
+    key = (payload["ArticleId"], payload["UpdatedAt"])
+    data = pdf_cache.get(key)
+    if data is None:
+        data = await _render(rendering.render_article, payload)
+        pdf_cache.set(key, data)
+    return data
+
+
+async def digest_pdf(payloads: List[dict]) -> bytes:
+    return await _render(rendering.render_digest, payloads)
+
+
+async def digest_zip(payloads: List[dict]) -> bytes:
+    # Каждая статья рендерится отдельной задачей — пул обрабатывает их параллельно
+    files = await asyncio.gather(*(article_pdf(payload) for payload in payloads))
+    buf = io.BytesIO()
+    # PDF уже сжат, поэтому ZIP_STORED
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as archive:
+        for payload, data in zip(payloads, files):
+            archive.writestr(f"article_{payload['ArticleId']}.pdf", data)
+    return buf.getvalue()
+
+
+async def profile_pdf(user) -> bytes:
+    payload = {"FirstName": user.FirstName, "LastName": user.LastName, "Email": user.Email}
+    return await _render(rendering.render_profile, payload)
+
+
+def iter_chunks(data: bytes, chunk_size: int = 64 * 1024):
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield bytes(view[start:start + chunk_size])
@@ -0,0 +1,78 @@
+"""Чистые функции рендеринга PDF.
+
+Выполняются в воркерах пула процессов (см. app.pdf), поэтому принимают только
+простые словари и не импортируют ничего из приложения. reportlab импортируется
+лениво — модуль можно подключать без него.
+"""
+from io import BytesIO
+from typing import Iterable, List
+
+PAGE_TOP = 800
+PAGE_BOTTOM = 50
+LEFT = 50
+LINE_HEIGHT = 14
+FONT = "Helvetica"
+FONT_SIZE = 12
+
+
+def _wrap(text: str, width: float) -> List[str]:
+    from reportlab.lib.utils import simpleSplit
+
+    lines: List[str] = []
+    for paragraph in (text or "").splitlines() or [""]:
+        lines.extend(simpleSplit(paragraph, FONT, FONT_SIZE, width) or [""])
+    return lines
+
+
+def _draw_article(p, article: dict) -> None:
+    width = p._pagesize[0] - 2 * LEFT
+    p.setFont(FONT, FONT_SIZE)
+    p.drawString(LEFT, PAGE_TOP, f"Title: {article['Title']}")
+    p.drawString(LEFT, PAGE_TOP - 20, f"Author ID: {article['AuthorId']}")
+    y = PAGE_TOP - 40
+    text = p.beginText(LEFT, y)
+    for line in _wrap(article["Body"], width):
+        if y < PAGE_BOTTOM:
+            # Текст не влез — переносим на следующую страницу
+            p.drawText(text)
+            p.showPage()
+            p.setFont(FONT, FONT_SIZE)
+            y = PAGE_TOP
+            text = p.beginText(LEFT, y)
+        text.textLine(line)
+        y -= LINE_HEIGHT
+    p.drawText(text)
+    p.showPage()
+
+
+def render_article(article: dict) -> bytes:
+    from reportlab.pdfgen import canvas
+
+    buf = BytesIO()
+    p = canvas.Canvas(buf)
+    _draw_article(p, article)
+    p.save()
+    return buf.getvalue()
+
+
+def render_digest(articles: Iterable[dict]) -> bytes:
+    from reportlab.pdfgen import canvas
+
+    buf = BytesIO()
+    p = canvas.Canvas(buf)
+    for article in articles:
+        _draw_article(p, article)
+    p.save()
+    return buf.getvalue()
+
+
+def render_profile(user: dict) -> bytes:
+    from reportlab.pdfgen import canvas
+
+    buf = BytesIO()
+    p = canvas.Canvas(buf)
+    p.drawString(LEFT, PAGE_TOP, f"{user['FirstName']} {user['LastName']}")
+    p.drawString(LEFT, PAGE_TOP - 20, f"Email: {user['Email']}")
+    p.showPage()
+    p.save()
+    return buf.getvalue()
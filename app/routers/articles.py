@@ -1,13 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from io import BytesIO
-from reportlab.pdfgen import canvas
+from typing import Dict, List, NamedTuple, Optional
+from datetime import datetime
 from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+import csv
+import io
+import json
 
-from app import crud, schemas
-from app.database import get_db
-from app.utils.security import get_current_user
+from app import bitmap, counters, crud, events, schemas
+from app import pdf as pdf_export
+from app import media
+from app.cache import article_cache
+from app.config import settings
+from app.database import SessionLocal, get_db, get_async_db, pinned_to_primary, read_from_primary, run_sync
+from app.serialization import ARTICLE_FIELDS, ARTICLE_VIEWS, dump_article, dump_json, select_fields
+from app.utils.security import Principal, get_current_principal
+from app.utils.pagination import decode_cursor, next_cursor
+from app.utils.http import conditional_response, if_match_versions, make_etag, version_etag
 
 router = APIRouter(
     prefix="/articles",
@@ -15,6 +25,56 @@ router = APIRouter(
 )
 
 
+class CachedBody(NamedTuple):
+    # Запись article_cache: готовое тело и всё, что нужно для условного GET
+    body: bytes
+    etag: str
+    last_modified: Optional[datetime]
+    headers: Dict[str, str]
+
+
+def _cached_response(request: Request, entry: CachedBody) -> Response:
+    # no-cache: клиент/CDN хранят копию, но перепроверяют её по ETag (304 без тела)
+    return conditional_response(
+        request, entry.body, entry.etag,
+        last_modified=entry.last_modified, cache_control="no-cache", headers=entry.headers,
+    )
+
+
+def _cache_lookup(db: Session, key) -> Optional[CachedBody]:
+    # Клиент в окне read-your-writes читает мимо кэша, прямо с primary
+    return None if pinned_to_primary(db) else article_cache.get(key)
+
+
+def _cache_store(db: Session, key, entry: CachedBody, generation: int) -> None:
+    # Только ответы primary: реплика может отставать и после сброса поколения, и её
+    # устаревший ответ получили бы все клиенты, включая того, кто только что записал
+    if read_from_primary(db):
+        article_cache.set(key, entry, generation=generation)
+
+
+def _list_cache_key(request: Request):
+    return ("list", request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+
+_FIELDS_HELP = "Поля через запятую (ArticleId, Title, Body, Author, Tags, ...); ArticleId есть всегда"
+_VIEW_HELP = "Готовый набор полей: summary — ArticleId, Title, CreatedAt; card — ещё Excerpt, StatusId, Tags"
+
+
+def _article_fields(fields: Optional[str], view: Optional[str]):
+    try:
+        return select_fields(fields, view, ARTICLE_FIELDS, ARTICLE_VIEWS, "ArticleId")
+    except ValueError as exc:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+def _list_entry(rows, cursor: Optional[str]) -> CachedBody:
+    # rows — DTO из crud.get_articles(as_dto=True), pydantic в этом пути не участвует
+    body = dump_json(rows)
+    # Last-Modified для списков не ставим: удаление статьи не сдвигает max(UpdatedAt)
+    return CachedBody(body, make_etag(body), None, {"X-Next-Cursor": cursor} if cursor else {})
+
+
 @router.get(
     "/",
     response_model=List[schemas.ArticleOut],
@@ -22,15 +82,47 @@ router = APIRouter(
     description="Возвращает опубликованные статьи (опционально filter by status)"
 )
 
-def list_published(
+async def list_published(
+    request: Request,
     skip: int = Query(0, ge=0, description="Skip N records"),
     limit: int = Query(10, ge=1, le=100, description="Max records"),
     status: Optional[int] = Query(None, description="Status ID for filtering"),
-    search: Optional[str] = Query(None, description="Search by article title"),
+    search: Optional[str] = Query(None, description="Полнотекстовый поиск по заголовку и тексту (результаты по релевантности, "
+                                                    f"не больше {settings.SEARCH_MAX_HITS} лучших совпадений)"),
     tag_id: Optional[int] = Query(None, description="Filter by tag ID"),
-    db: Session = Depends(get_db)
+    tags: Optional[str] = Query(None, description='Выражение по тегам: ESP32 AND (STM32 OR "Raspberry Pi"), '
+                                                  'AND/OR/NOT, скобки, имена или ID тегов'),
+    cursor: Optional[str] = Query(None, description="Keyset cursor из заголовка X-Next-Cursor (skip игнорируется; "
+                                                    "с search не сочетается)"),
+    fields: Optional[str] = Query(None, description=_FIELDS_HELP),
+    view: Optional[str] = Query(None, description=_VIEW_HELP),
+    db: Session = Depends(get_async_db)
 ):
-    return crud.get_articles(db, skip=skip, limit=limit, status_id=status, search=search, tag_id=tag_id)
+    if cursor and search is not None:
+        # status здесь — параметр запроса, а не fastapi.status
+        raise HTTPException(status_code=400, detail="cursor нельзя сочетать с search: листайте результаты поиска через skip")
+    after_id = decode_cursor(cursor, status=status, tag=tag_id, q=search, tags=tags)
+    projection = _article_fields(fields, view)
+    key = _list_cache_key(request)
+    entry = _cache_lookup(db, key)
+    if entry is None:
+        generation = article_cache.generation
+        try:
+            rows = await run_sync(
+                db, crud.get_articles,
+                skip=skip, limit=limit, status_id=status, search=search, tag_id=tag_id, after_id=after_id,
+                as_dto=True, tag_expr=tags, fields=projection
+            )
+        except ValueError as exc:
+            # status здесь — параметр запроса, а не fastapi.status
+            raise HTTPException(status_code=400, detail=str(exc))
+        # Результаты поиска упорядочены по релевантности, keyset к ним неприменим
+        nxt = None if search else next_cursor(
+            rows, "ArticleId", limit, status=status, tag=tag_id, q=search, tags=tags
+        )
+        entry = _list_entry(rows, nxt)
+        _cache_store(db, key, entry, generation)
+    return _cached_response(request, entry)
 
 
 @router.get(
@@ -39,12 +131,184 @@ def list_published(
     summary="List All",
     description="Возвращает все статьи, вне зависимости от статуса"
 )
-def list_all(
+async def list_all(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Keyset cursor из заголовка X-Next-Cursor (skip игнорируется; "
+                                                    "с search не сочетается)"),
+    fields: Optional[str] = Query(None, description=_FIELDS_HELP),
+    view: Optional[str] = Query(None, description=_VIEW_HELP),
+    db: Session = Depends(get_async_db)
 ):
-    return crud.get_articles(db, skip=skip, limit=limit, status_id=None)
+    after_id = decode_cursor(cursor, status=None, tag=None, q=None)
+    projection = _article_fields(fields, view)
+    key = _list_cache_key(request)
+    entry = _cache_lookup(db, key)
+    if entry is None:
+        generation = article_cache.generation
+        rows = await run_sync(
+            db, crud.get_articles, skip=skip, limit=limit, status_id=None, after_id=after_id, as_dto=True,
+            fields=projection
+        )
+        entry = _list_entry(rows, next_cursor(rows, "ArticleId", limit, status=None, tag=None, q=None))
+        _cache_store(db, key, entry, generation)
+    return _cached_response(request, entry)
+
+
+@router.get(
+    "/facets",
+    summary="Facets",
+    description="Число статей под фильтром и разбивка по тегам и статусам (по битовому индексу, без SQL)"
+)
+async def facets(
+    status: Optional[int] = Query(None, description="Status ID for filtering"),
+    tag_id: Optional[int] = Query(None, description="Filter by tag ID"),
+    tags: Optional[str] = Query(None, description="Выражение по тегам, как в GET /articles/"),
+    search: Optional[str] = Query(None, description="Полнотекстовый поиск"),
+    db: Session = Depends(get_async_db)
+):
+    try:
+        return await run_sync(db, crud.article_facets, tag_expr=tags, status_id=status, tag_id=tag_id, search=search)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except bitmap.IndexNotReady as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+
+
+@router.get(
+    "/changes",
+    summary="Changes",
+    description="Лента изменений статей (Server-Sent Events): created, updated, published, deleted. "
+                "Продолжение с места обрыва — по заголовку Last-Event-ID (или параметру last_event_id); "
+                "event: reset означает, что события потеряны и список нужно перечитать"
+)
+async def changes(
+    last_event_id: Optional[str] = Query(None, description="id последнего полученного события"),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    if events.feed.subscribers >= settings.EVENTS_MAX_SUBSCRIBERS:
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, detail="Слишком много подписчиков",
+                            headers={"Retry-After": str(settings.EVENTS_RETRY_MS // 1000 or 1)})
+    return StreamingResponse(
+        events.feed.stream(last_event_id_header or last_event_id),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx не должен копить события в буфере
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/trending",
+    summary="Trending",
+    description="Популярные сейчас: просмотры и скачивания PDF с экспоненциальным затуханием "
+                "(период полураспада TRENDING_HALF_LIFE_MINUTES). Считается в памяти воркера, без ORDER BY по таблице"
+)
+async def trending(
+    limit: int = Query(10, ge=1, le=100),
+    fields: Optional[str] = Query(None, description=_FIELDS_HELP),
+    view: Optional[str] = Query(None, description=_VIEW_HELP),
+    db: Session = Depends(get_async_db)
+):
+    projection = _article_fields(fields, view)
+    ranked = [article_id for article_id, _ in counters.trending.top(limit)]
+    rows = await run_sync(db, crud.get_articles_by_ids, ranked, fields=projection)
+    return Response(dump_json(rows), media_type="application/json")
+
+
+@router.get(
+    "/digest",
+    summary="Digest Pdf",
+    description="Дайджест из нескольких статей (по ids, тегу или диапазону дат) одним PDF или ZIP"
+)
+async def digest(
+    ids: Optional[List[int]] = Query(None, description="ID статей"),
+    tag_id: Optional[int] = Query(None, description="Filter by tag ID"),
+    date_from: Optional[datetime] = Query(None, description="CreatedAt >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="CreatedAt < date_to"),
+    format: str = Query("pdf", pattern="^(pdf|zip)$", description="pdf — один файл, zip — PDF на каждую статью"),
+    limit: int = Query(20, ge=1, le=settings.PDF_DIGEST_MAX),
+    db: Session = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    if not ids and tag_id is None and date_from is None and date_to is None:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Укажите ids, tag_id или диапазон дат")
+    arts = await run_sync(
+        db, crud.get_articles_for_digest,
+        ids=ids, tag_id=tag_id, date_from=date_from, date_to=date_to, limit=limit
+    )
+    if not arts:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Статьи не найдены")
+    payloads = [pdf_export.article_payload(art) for art in arts]
+    if format == "zip":
+        data = await pdf_export.digest_zip(payloads)
+        media_type, filename = "application/zip", "digest.zip"
+    else:
+        data = await pdf_export.digest_pdf(payloads)
+        media_type, filename = "application/pdf", "digest.pdf"
+    return StreamingResponse(
+        pdf_export.iter_chunks(data),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+def _export_stream(fmt: str, filters: dict):
+    # Собственные сессии: зависимость get_db закрывается раньше, чем уйдёт тело ответа
+    db = SessionLocal()
+    tags_db = SessionLocal()
+    try:
+        if fmt == "csv":
+            header = io.StringIO()
+            csv.writer(header).writerow(crud.EXPORT_COLUMNS + ("TagIds",))
+            yield header.getvalue().encode()
+        for batch in crud.iter_articles_for_export(db, tags_db, **filters):
+            out = io.StringIO()
+            if fmt == "csv":
+                writer = csv.writer(out)
+                for item in batch:
+                    writer.writerow(
+                        [_export_value(item[name]) for name in crud.EXPORT_COLUMNS]
+                        + [";".join(map(str, item["TagIds"]))]
+                    )
+            else:
+                for item in batch:
+                    out.write(json.dumps(item, ensure_ascii=False, default=_export_value))
+                    out.write("\n")
+            yield out.getvalue().encode()
+    finally:
+        tags_db.close()
+        db.close()
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+@router.get(
+    "/export",
+    summary="Export",
+    description="Потоковая выгрузка статей в NDJSON или CSV с фильтрами по статусу, тегу и дате"
+)
+def export(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    status: Optional[int] = Query(None, description="Status ID for filtering"),
+    tag_id: Optional[int] = Query(None, description="Filter by tag ID"),
+    date_from: Optional[datetime] = Query(None, description="CreatedAt >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="CreatedAt < date_to"),
+):
+    filters = {"status_id": status, "tag_id": tag_id, "date_from": date_from, "date_to": date_to}
+    if format == "csv":
+        media_type, filename = "text/csv; charset=utf-8", "articles.csv"
+    else:
+        media_type, filename = "application/x-ndjson", "articles.ndjson"
+    return StreamingResponse(
+        _export_stream(format, filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 
 @router.get(
@@ -53,14 +317,27 @@ def list_all(
     summary="Get One",
     description="Возвращает статью по её ID"
 )
-def get_one(
+async def get_one(
+    request: Request,
     article_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_async_db)
 ):
-    art = crud.get_article(db, article_id)
-    if not art:
-        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Статья не найдена")
-    return art
+    key = ("detail", article_id)
+    entry = _cache_lookup(db, key)
+    if entry is None:
+        generation = article_cache.generation
+        art = await run_sync(db, crud.get_article, article_id)
+        if not art:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Статья не найдена")
+        version = art.UpdatedAt or art.CreatedAt
+        body = dump_article(art)
+        # Last-Modified не ставим, как и у списков: правка автора или backfill меняют тело,
+        # не сдвигая UpdatedAt, и If-Modified-Since ответил бы 304 на устаревшую копию
+        entry = CachedBody(body, version_etag(art.ArticleId, version, body), None, {})
+        _cache_store(db, key, entry, generation)
+    # Просмотр (и 304 тоже) — только счётчик в памяти, запись в БД пачкой из app.counters
+    counters.record_view(article_id)
+    return _cached_response(request, entry)
 
 
 @router.post(
@@ -73,44 +350,153 @@ def get_one(
 def create(
     article_in: schemas.ArticleCreate,
     db: Session = Depends(get_db),
-    current_user=Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
+):
+    try:
+        return crud.create_article(db, article_in, author_id=current_user.user_id)
+    except ValueError as exc:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+async def _bulk_items(request: Request):
+    """(номер, сырой элемент) из JSON-массива или построчно из потока NDJSON."""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        buffer = b""
+        index = 0
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield index, line
+                    index += 1
+        if buffer.strip():
+            yield index, buffer
+        return
+    try:
+        data = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Ожидается JSON-массив или NDJSON")
+    if not isinstance(data, list):
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Ожидается JSON-массив")
+    # Размер массива известен заранее — отказ до первой транзакции
+    if len(data) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(status.HTTP_413_CONTENT_TOO_LARGE,
+                            detail=f"Не более {settings.BULK_MAX_ITEMS} статей за запрос")
+    for index, item in enumerate(data):
+        yield index, item
+
+
+@router.post(
+    "/bulk",
+    summary="Bulk Create",
+    description="Пакетная загрузка статей: JSON-массив ArticleCreate или поток NDJSON "
+                "(Content-Type: application/x-ndjson). Возвращает результат по каждому элементу. "
+                "Массив длиннее BULK_MAX_ITEMS отклоняется целиком (413); в потоке NDJSON строки "
+                "сверх лимита не загружаются и получают status=rejected."
+)
+async def bulk_create(
+    request: Request,
+    commit_size: int = Query(settings.BULK_COMMIT_SIZE, ge=1, le=5000, description="Статей на транзакцию"),
+    db: Session = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    return crud.create_article(db, article_in)
+    results = []
+    chunk = []
+    rejected = f"Сверх лимита {settings.BULK_MAX_ITEMS} статей за запрос"
+    async for index, raw in _bulk_items(request):
+        if index >= settings.BULK_MAX_ITEMS:
+            # Начало потока уже могло быть закоммичено: вместо 413 дочитываем и помечаем
+            # остаток, чтобы клиент знал, что загружено, а повтор не создал дублей
+            results.append({"index": index, "status": "rejected", "error": rejected})
+            continue
+        try:
+            if isinstance(raw, bytes):
+                article = schemas.ArticleCreate.model_validate_json(raw)
+            else:
+                article = schemas.ArticleCreate.model_validate(raw)
+        except ValidationError as exc:
+            results.append({"index": index, "status": "error", "error": exc.errors(include_url=False)})
+            continue
+        chunk.append((index, article))
+        if len(chunk) >= commit_size:
+            results.extend(await run_sync(db, crud.bulk_create_articles, chunk, current_user.user_id))
+            chunk = []
+    if chunk:
+        results.extend(await run_sync(db, crud.bulk_create_articles, chunk, current_user.user_id))
+    results.sort(key=lambda r: r["index"])
+    created = sum(1 for r in results if r["status"] == "created")
+    return {"created": created, "failed": len(results) - created, "items": results}
+
+
+def _precondition_failed(db: Session, article_id: int, versions) -> HTTPException:
+    # UPDATE/DELETE не затронул строк: либо статьи нет, либо её версия ушла вперёд
+    if versions is not None and crud.article_exists(db, article_id):
+        return HTTPException(status.HTTP_412_PRECONDITION_FAILED,
+                             detail="Статья изменена с момента чтения, получите актуальную версию")
+    return HTTPException(status.HTTP_404_NOT_FOUND, detail="Статья не найдена")
 
 
 @router.put(
     "/{article_id}",
     response_model=schemas.ArticleOut,
     summary="Update",
-    description="Обновляет существующую статью"
+    description="Обновляет существующую статью. С заголовком If-Match (ETag из GET) "
+                "правка применяется, только если статью никто не изменил, иначе 412."
 )
 def update(
+    request: Request,
     article_id: int,
     update_data: schemas.ArticleUpdate,
     db: Session = Depends(get_db),
-    current_user=Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    art = crud.get_article(db, article_id)
-    if not art:
-        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Статья не найдена")
-    return crud.update_article(db, art, update_data)
+    versions = if_match_versions(request, article_id)
+    try:
+        updated = crud.update_article(db, article_id, update_data, versions)
+    except ValueError as exc:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    if updated is None:
+        raise _precondition_failed(db, article_id, versions)
+    dto, version = updated
+    body = dump_json(dto)
+    return Response(body, media_type="application/json", headers={"ETag": version_etag(article_id, version, body)})
 
 
 @router.delete(
     "/{article_id}",
     status_code=status.HTTP_204_NO_CONTENT,
     summary="Delete",
-    description="Удаляет статью по ID"
+    description="Удаляет статью по ID (с If-Match — только актуальную версию, иначе 412)"
 )
 def delete(
+    request: Request,
     article_id: int,
     db: Session = Depends(get_db),
-    current_user=Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    art = crud.get_article(db, article_id)
-    if not art:
-        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Статья не найдена")
-    crud.delete_article(db, art)
+    versions = if_match_versions(request, article_id)
+    if not crud.delete_article(db, article_id, versions):
+        raise _precondition_failed(db, article_id, versions)
+    counters.forget(article_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get(
+    "/{article_id}/image",
+    summary="Article Image",
+    description="Картинка статьи: поддерживает Range, ETag и миниатюры (?w=ширина)"
+)
+async def image(
+    request: Request,
+    article_id: int,
+    w: Optional[int] = Query(None, ge=16, le=settings.THUMBNAIL_MAX_WIDTH, description="Ширина миниатюры"),
+    db: Session = Depends(get_async_db)
+):
+    return await media.serve(
+        request, ("article", article_id), lambda: run_sync(db, crud.get_article_image, article_id), w
+    )
 
 
 @router.get(
@@ -118,29 +504,18 @@ def delete(
     summary="Article Pdf",
     description="Генерирует PDF для статьи"
 )
-def pdf(
+async def pdf(
     article_id: int,
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user)
+    db: Session = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    art = crud.get_article(db, article_id)
+    art = await run_sync(db, crud.get_article, article_id)
     if not art:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Статья не найдена")
-
-    buf = BytesIO()
-    p = canvas.Canvas(buf)
-    p.drawString(50, 800, f"Title: {art.Title}")
-    p.drawString(50, 780, f"Author ID: {art.AuthorId}")
-    text = p.beginText(50, 760)
-    for line in art.Body.splitlines():
-        text.textLine(line)
-    p.drawText(text)
-    p.showPage()
-    p.save()
-    buf.seek(0)
-
-    return StreamingResponse(
-        buf,
+    data = await pdf_export.article_pdf(pdf_export.article_payload(art))
+    counters.record_download(article_id)
+    return Response(
+        data,
         media_type="application/pdf",
         headers={"Content-Disposition": f"inline; filename=article_{article_id}.pdf"}
     )
@@ -1,22 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app import crud, schemas
-from app.database import get_db
-from app.utils.security import get_password_hash, verify_password, create_access_token
+from app.database import get_async_db, run_sync
+from app.utils.security import hash_password_async, verify_password_async, create_user_token
 
 router = APIRouter(tags=["Auth"])
 
 @router.post("/register", response_model=schemas.UserOut, summary="Регистрация")
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    if crud.get_user_by_login(db, user.Login):
+async def register(user: schemas.UserCreate, db: Session = Depends(get_async_db)):
+    if await run_sync(db, crud.get_user_by_login, user.Login):
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Login already exists")
-    user.PasswordHash = get_password_hash(user.PasswordHash)
-    return crud.create_user(db, user)
+    password_hash = await hash_password_async(user.Password)
+    return await run_sync(db, crud.create_user, user, password_hash)
 
 @router.post("/login", summary="Авторизация")
-def login(data: schemas.UserBase, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_login(db, data.Login)
-    if not db_user or not verify_password(data.PasswordHash, db_user.PasswordHash):
+async def login(data: schemas.LoginIn, db: Session = Depends(get_async_db)):
+    db_user = await run_sync(db, crud.get_user_by_login, data.Login)
+    if not db_user:
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Invalid credentials")
-    token = create_access_token({"sub": db_user.Login})
+    valid, new_hash = await verify_password_async(data.Password, db_user.PasswordHash)
+    if not valid:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Invalid credentials")
+    if new_hash:
+        # BCRYPT_ROUNDS изменился — прозрачно перехешируем, пока пароль известен
+        await run_sync(db, crud.update_password_hash, db_user.UserId, new_hash)
+    token = create_user_token(db_user)
     return {"access_token": token, "token_type": "bearer"}
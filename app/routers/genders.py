@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from typing import List
 from app import crud, schemas
+from app.cache import cached_reference
 from app.database import get_db
 
 router = APIRouter(tags=["Genders"])
 
 @router.get("/", response_model=List[schemas.GenderOut], summary="Список полов")
-def read_genders(db: Session = Depends(get_db)):
-    return crud.get_genders(db)
+def read_genders(request: Request, db: Session = Depends(get_db)):
+    return cached_reference(request, "genders", schemas.GenderOut, lambda: crud.get_genders(db))
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from typing import List
 from app import crud, schemas
+from app.cache import cached_reference
 from app.database import get_db
 
 router = APIRouter(tags=["Statuses"])
 
 @router.get("/", response_model=List[schemas.StatusOut], summary="Список статусов")
-def read_statuses(db: Session = Depends(get_db)):
-    return crud.get_statuses(db)
+def read_statuses(request: Request, db: Session = Depends(get_db)):
+    return cached_reference(request, "statuses", schemas.StatusOut, lambda: crud.get_statuses(db))
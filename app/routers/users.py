@@ -1,19 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from reportlab.pdfgen import canvas
-from io import BytesIO
+from starlette.concurrency import run_in_threadpool
 from app import crud, schemas, models
-from app.database import get_db
-from app.utils.security import get_current_user, verify_password, get_password_hash
+from app import pdf as pdf_export
+from app import media
+from app.config import settings
+from app.cache import invalidate_article, media_cache
+from app.database import get_db, get_async_db, run_sync
+from app.serialization import USER_FIELDS, USER_VIEWS, dump_users, select_fields
+from app.utils.security import get_current_user, hash_password_async, verify_password_async, invalidate_principal
+from app.utils.pagination import decode_cursor, next_cursor
 
-from typing import List
+from typing import List, Optional
 
 router = APIRouter(tags=["Users"])
 
 
 @router.get("/", response_model=List[schemas.UserOut], summary="Список пользователей")
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_users(db, skip=skip, limit=limit)
+async def read_users(skip: int = 0, limit: int = 100,
+                     cursor: Optional[str] = Query(None, description="Keyset cursor из заголовка X-Next-Cursor"),
+                     fields: Optional[str] = Query(None, description="Поля через запятую; UserId есть всегда"),
+                     view: Optional[str] = Query(None, description="summary — UserId, Login, FirstName, LastName"),
+                     db: Session = Depends(get_async_db)):
+    try:
+        projection = select_fields(fields, view, USER_FIELDS, USER_VIEWS, "UserId")
+    except ValueError as exc:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    rows = await run_sync(db, crud.get_users, skip=skip, limit=limit, after_id=decode_cursor(cursor),
+                          fields=projection)
+    nxt = next_cursor(rows, "UserId", limit)
+    # Готовое тело через TypeAdapter: без повторной валидации response_model
+    return Response(dump_users(rows, projection), media_type="application/json",
+                    headers={"X-Next-Cursor": nxt} if nxt else None)
 
 
 @router.get("/me", response_model=schemas.UserOut, summary="Профиль")
@@ -26,40 +44,47 @@ def update_profile(update: schemas.UserCreate, db: Session = Depends(get_db),
                    current: models.User = Depends(get_current_user)):
     # Исключаем пароль из обновления профиля
     update_data = update.dict(exclude={'Password'}, exclude_unset=True)
+    old_login = current.Login
     for field, val in update_data.items():
         setattr(current, field, val)
     db.commit()
     db.refresh(current)
+    invalidate_principal(old_login)
+    # Автор вложен в ArticleOut — закэшированные статьи больше не актуальны
+    invalidate_article()
+    media_cache.invalidate(("user", current.UserId))
     return current
 
 
 @router.put("/me/password", summary="Сменить пароль")
-def change_password(old: str, new: str, db: Session = Depends(get_db),
-                    current: models.User = Depends(get_current_user)):
-    if not verify_password(old, current.PasswordHash):
+async def change_password(old: str, new: str, db: Session = Depends(get_db),
+                          current: models.User = Depends(get_current_user)):
+    valid, _ = await verify_password_async(old, current.PasswordHash)
+    if not valid:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Old password incorrect")
-    current.PasswordHash = get_password_hash(new)
-    db.commit()
+    current.PasswordHash = await hash_password_async(new)
+    await run_in_threadpool(db.commit)
+    invalidate_principal(current.Login)
     return {"msg": "Password updated"}
 
 
 @router.get("/me/pdf", summary="Профиль PDF")
-def profile_pdf(current: models.User = Depends(get_current_user)):
-    buf = BytesIO()
-    p = canvas.Canvas(buf)
-    p.drawString(50, 800, f"{current.FirstName} {current.LastName}")
-    p.drawString(50, 780, f"Email: {current.Email}")
-    p.showPage()
-    p.save()
-    buf.seek(0)
-    return Response(buf.read(), media_type="application/pdf")
+async def profile_pdf(current: models.User = Depends(get_current_user)):
+    return Response(await pdf_export.profile_pdf(current), media_type="application/pdf")
+
+
+@router.get("/{user_id}/photo", summary="Фото пользователя")
+async def user_photo(request: Request, user_id: int,
+                     w: Optional[int] = Query(None, ge=16, le=settings.THUMBNAIL_MAX_WIDTH, description="Ширина миниатюры"),
+                     db: Session = Depends(get_async_db)):
+    return await media.serve(request, ("user", user_id), lambda: run_sync(db, crud.get_user_photo, user_id), w)
 
 
 @router.post("/", response_model=schemas.UserOut, summary="Создать пользователя")
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: schemas.UserCreate, db: Session = Depends(get_async_db)):
     """Создать нового пользователя"""
     # Проверяем уникальность логина
-    existing_user = crud.get_user_by_login(db, user.Login)
+    existing_user = await run_sync(db, crud.get_user_by_login, user.Login)
     if existing_user:
         raise HTTPException(
             status_code=400,
@@ -67,11 +92,12 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         )
 
     # Проверяем уникальность email
-    existing_email = db.query(models.User).filter(models.User.Email == user.Email).first()
+    existing_email = await run_sync(db, crud.get_user_by_email, user.Email)
     if existing_email:
         raise HTTPException(
             status_code=400,
             detail="Пользователь с таким email уже существует"
         )
 
-    return crud.create_user(db=db, user=user)
\ No newline at end of file
+    password_hash = await hash_password_async(user.Password)
+    return await run_sync(db, crud.create_user, user, password_hash)
\ No newline at end of file
@@ -29,16 +29,21 @@ class UserBase(BaseModel):
     GenderId: int
     Email: EmailStr
     Login: str
-    Photo: Optional[bytes] = None
 
 class UserCreate(UserBase):
     # Клиент отправляет обычный пароль, а не хеш
     Password: str
+    Photo: Optional[bytes] = None
+
+class LoginIn(BaseModel):
+    Login: str
+    Password: str
 
 class UserOut(UserBase):
     UserId: int
     CreatedAt: datetime
-    # PasswordHash не выводим в ответе из соображений безопасности
+    # PasswordHash не выводим в ответе из соображений безопасности,
+    # Photo — отдельным запросом на /users/{UserId}/photo
     model_config = ConfigDict(from_attributes=True)
 
 # статьи
@@ -67,4 +72,5 @@ class ArticleOut(ArticleBase):
     Tags: List[TagOut]
     CreatedAt: datetime
     UpdatedAt: Optional[datetime] = None
+    Excerpt: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
@@ -0,0 +1,361 @@
+"""Полнотекстовый поиск по статьям (Title + Body).
+
+Вместо ``lower(Title) LIKE '%x%'`` запрос идёт в инвертированный индекс,
+который возвращает ArticleId, отсортированные по релевантности (BM25, заголовок
+весит больше тела). Последнее слово запроса ищется по префиксу — поиск «по мере
+ввода». Индекс обновляется из crud при create/update/delete, строится из БД в
+фоне при старте приложения (или при первом обращении) и перестраивается раз в
+SEARCH_REFRESH_SECONDS — так подхватываются записи соседних воркеров.
+Перестройка заменяет индекс целиком: до её конца поиск идёт по старому.
+Запрос построения не ждёт: пока индекс впервые строит другой поток —
+IndexNotReady, и crud ищет через ``sql_search`` (Title и Excerpt, без ранжирования).
+
+Запрос возвращает не больше SEARCH_MAX_HITS лучших совпадений: skip за этой
+границей даёт пустую страницу, а фильтры по статусу/тегу и фасеты считаются
+только среди них.
+
+Бэкенды (переменная окружения ``SEARCH_BACKEND``):
+
+* ``memory`` (по умолчанию) — индекс в памяти процесса;
+* ``fts5`` — SQLite FTS5 (файл ``SEARCH_FTS_PATH``, по умолчанию в памяти).
+  Файловый вариант можно разделить между воркерами на одной машине.
+"""
+import math
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+
+TITLE_WEIGHT = 3.0
+MAX_HITS = settings.SEARCH_MAX_HITS
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text: Optional[str]) -> str:
+    return (text or "").lower().replace("ё", "е")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(normalize(text))
+
+
+class SearchBackend:
+    """Общий интерфейс бэкендов поиска."""
+
+    def __init__(self):
+        self.ready = False
+        self.built_at = 0.0
+
+    def load(self, rows: Iterable) -> int:
+        """Заменяет содержимое строками (ArticleId, Title, Body); возвращает их число."""
+        raise NotImplementedError
+
+    def index(self, article_id: int, title: str, body: str) -> None:
+        raise NotImplementedError
+
+    def remove(self, article_id: int) -> None:
+        raise NotImplementedError
+
+    def search(self, query: str, limit: int = MAX_HITS) -> List[int]:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class InMemoryIndex(SearchBackend):
+    """Инвертированный индекс term -> {ArticleId: взвешенная частота}."""
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+            self._doc_terms: Dict[int, Set[str]] = {}
+            self._doc_len: Dict[int, float] = {}
+            self._total_len = 0.0
+            # Отсортированный словарь для префиксного поиска
+            self._terms: List[str] = []
+            self.ready = False
+
+    def load(self, rows: Iterable) -> int:
+        # Новый индекс строится рядом и подменяется одной операцией под блокировкой
+        fresh = InMemoryIndex()
+        count = 0
+        for article_id, title, body in rows:
+            fresh.index(article_id, title, body)
+            count += 1
+        with self._lock:
+            self._postings = fresh._postings
+            self._doc_terms = fresh._doc_terms
+            self._doc_len = fresh._doc_len
+            self._total_len = fresh._total_len
+            self._terms = fresh._terms
+        return count
+
+    def index(self, article_id: int, title: str, body: str) -> None:
+        freqs: Dict[str, float] = defaultdict(float)
+        for term in tokenize(title):
+            freqs[term] += TITLE_WEIGHT
+        for term in tokenize(body):
+            freqs[term] += 1.0
+        with self._lock:
+            self._remove_locked(article_id)
+            for term, tf in freqs.items():
+                posting = self._postings[term]
+                if not posting:
+                    insort(self._terms, term)
+                posting[article_id] = tf
+            self._doc_terms[article_id] = set(freqs)
+            length = sum(freqs.values())
+            self._doc_len[article_id] = length
+            self._total_len += length
+
+    def remove(self, article_id: int) -> None:
+        with self._lock:
+            self._remove_locked(article_id)
+
+    def _remove_locked(self, article_id: int) -> None:
+        terms = self._doc_terms.pop(article_id, None)
+        if terms is None:
+            return
+        self._total_len -= self._doc_len.pop(article_id, 0.0)
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(article_id, None)
+            if not posting:
+                del self._postings[term]
+                pos = bisect_left(self._terms, term)
+                if pos < len(self._terms) and self._terms[pos] == term:
+                    del self._terms[pos]
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        start = bisect_left(self._terms, prefix)
+        out = []
+        for term in self._terms[start:]:
+            if not term.startswith(prefix):
+                break
+            out.append(term)
+        return out
+
+    def search(self, query: str, limit: int = MAX_HITS) -> List[int]:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if not n_docs:
+                return []
+            avg_len = self._total_len / n_docs
+            scores: Optional[Dict[int, float]] = None
+            for i, token in enumerate(tokens):
+                # Последнее слово — префикс: пользователь ещё печатает
+                terms = self._expand_prefix(token) if i == len(tokens) - 1 else [token]
+                token_scores: Dict[int, float] = defaultdict(float)
+                for term in terms:
+                    posting = self._postings.get(term)
+                    if not posting:
+                        continue
+                    idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                    for doc_id, tf in posting.items():
+                        norm = self.K1 * (1 - self.B + self.B * self._doc_len[doc_id] / avg_len)
+                        token_scores[doc_id] += idf * tf * (self.K1 + 1) / (tf + norm)
+                # Все слова запроса обязательны (AND)
+                if scores is None:
+                    scores = dict(token_scores)
+                else:
+                    scores = {d: s + token_scores[d] for d, s in scores.items() if d in token_scores}
+                if not scores:
+                    return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [doc_id for doc_id, _ in ranked[:limit]]
+
+
+class SQLiteFTSIndex(SearchBackend):
+    """Индекс на SQLite FTS5; rowid таблицы совпадает с ArticleId."""
+
+    def __init__(self, path: str = ":memory:"):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS article_fts "
+            "USING fts5(title, body, tokenize='unicode61 remove_diacritics 2')"
+        )
+        self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM article_fts")
+            self._conn.commit()
+            self.ready = False
+
+    def index(self, article_id: int, title: str, body: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM article_fts WHERE rowid = ?", (article_id,))
+            self._conn.execute(
+                "INSERT INTO article_fts(rowid, title, body) VALUES (?, ?, ?)",
+                (article_id, normalize(title), normalize(body)),
+            )
+            self._conn.commit()
+
+    def load(self, rows: Iterable, batch_size: int = 1000) -> int:
+        # Одна транзакция: соседние воркеры с тем же файлом видят либо старый, либо новый индекс
+        count = 0
+        with self._lock:
+            self._conn.execute("DELETE FROM article_fts")
+            batch = []
+            for row in rows:
+                batch.append((row[0], normalize(row[1]), normalize(row[2])))
+                if len(batch) >= batch_size:
+                    self._insert_many(batch)
+                    count += len(batch)
+                    batch = []
+            self._insert_many(batch)
+            count += len(batch)
+            self._conn.commit()
+        return count
+
+    def _insert_many(self, batch: list) -> None:
+        self._conn.executemany("INSERT OR REPLACE INTO article_fts(rowid, title, body) VALUES (?, ?, ?)", batch)
+
+    def remove(self, article_id: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM article_fts WHERE rowid = ?", (article_id,))
+            self._conn.commit()
+
+    def search(self, query: str, limit: int = MAX_HITS) -> List[int]:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # Каждое слово в кавычках (без операторов FTS), последнее — префикс
+        match = " ".join(f'"{t}"' for t in tokens[:-1])
+        match = f'{match} "{tokens[-1]}"*'.strip()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rowid FROM article_fts WHERE article_fts MATCH ? "
+                "ORDER BY bm25(article_fts, ?, 1.0) LIMIT ?",
+                (match, TITLE_WEIGHT, limit),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+
+def _create_backend() -> SearchBackend:
+    name = settings.SEARCH_BACKEND
+    if name == "fts5":
+        return SQLiteFTSIndex(settings.SEARCH_FTS_PATH)
+    if name == "memory":
+        return InMemoryIndex()
+    raise ValueError(f"Неизвестный SEARCH_BACKEND: {name}")
+
+
+backend: SearchBackend = _create_backend()
+_rebuild_lock = threading.Lock()
+
+
+class IndexNotReady(RuntimeError):
+    """Индекс ещё не построен, а строит его другой поток."""
+
+
+def rebuild_index(db: Session, batch_size: int = 1000) -> int:
+    """Перестраивает индекс из таблицы Article, возвращает число статей."""
+    with _rebuild_lock:
+        return _rebuild_locked(db, batch_size)
+
+
+def _rebuild_locked(db: Session, batch_size: int = 1000) -> int:
+    rows = (
+        db.query(models.Article.ArticleId, models.Article.Title, models.Article.Body)
+        .yield_per(batch_size)
+    )
+    count = backend.load(rows)
+    backend.built_at = time.monotonic()
+    backend.ready = True
+    return count
+
+
+def refresh_in_background() -> None:
+    """Перестройка в отдельном потоке со своей сессией (старт приложения, устаревший индекс)."""
+    from app.database import SessionLocal
+
+    if not _rebuild_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            with SessionLocal() as db:
+                _rebuild_locked(db)
+        finally:
+            _rebuild_lock.release()
+
+    threading.Thread(target=run, name="search-refresh", daemon=True).start()
+
+
+def search_articles(db: Session, query: str, limit: int = MAX_HITS) -> List[int]:
+    """ArticleId по убыванию релевантности (не больше limit).
+
+    Если индекс ещё не построен (прогрев не успел или выключен) — строит его
+    сразу, а если его уже строит другой поток — IndexNotReady; устаревший
+    перестраивается в фоне.
+    """
+    if not backend.ready:
+        if not _rebuild_lock.acquire(blocking=False):
+            raise IndexNotReady("Поисковый индекс строится")
+        try:
+            if not backend.ready:
+                _rebuild_locked(db)
+        finally:
+            _rebuild_lock.release()
+    elif settings.SEARCH_REFRESH_SECONDS and time.monotonic() - backend.built_at > settings.SEARCH_REFRESH_SECONDS:
+        refresh_in_background()
+    return backend.search(query, limit)
+
+
+def sql_search(db: Session, query: str, limit: int = MAX_HITS) -> List[int]:
+    """Запасной поиск в SQL, пока индекс не готов: все слова в Title или Excerpt, новые первыми.
+
+    Регистр не различается через collation SQL Server; lower() в SQLite — только для ASCII.
+    """
+    columns = (func.lower(models.Article.Title), func.lower(models.Article.Excerpt))
+    words = [or_(*(column.contains(word, autoescape=True) for column in columns)) for word in tokenize(query)]
+    if not words:
+        return []
+    rows = (
+        db.query(models.Article.ArticleId)
+        .filter(and_(*words))
+        .order_by(models.Article.ArticleId.desc())
+        .limit(limit)
+    )
+    return [row[0] for row in rows]
+
+
+def index_article(article: models.Article) -> None:
+    backend.index(article.ArticleId, article.Title, article.Body)
+
+
+def index_fields(article_id: int, title: str, body: str) -> None:
+    backend.index(article_id, title, body)
+
+
+def remove_article(article_id: int) -> None:
+    backend.remove(article_id)
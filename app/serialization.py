@@ -0,0 +1,143 @@
+"""Сериализация ответов в JSON.
+
+Два пути:
+
+* ORM-объекты — через заранее собранные TypeAdapter (одна валидация
+  from_attributes и dump_json в Rust, без jsonable_encoder и json.dumps);
+* списки статей — DTO-словари из плоских строк запроса
+  (``crud.get_articles(as_dto=True)``), которые кодируются orjson без pydantic:
+  данные пришли из БД и уже имеют форму ArticleOut.
+
+Порядок ключей DTO совпадает с полями схем, так что тело (и ETag) не зависит
+от выбранного пути.
+
+Списки принимают ``fields=`` / ``view=``: select_fields превращает их в
+кортеж полей в порядке схемы, crud читает из БД только нужные колонки, а
+ответ содержит только эти ключи.
+"""
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import ConfigDict, TypeAdapter, create_model
+
+from app import schemas
+
+ARTICLE_ADAPTER = TypeAdapter(schemas.ArticleOut)
+ARTICLE_LIST_ADAPTER = TypeAdapter(List[schemas.ArticleOut])
+USER_ADAPTER = TypeAdapter(schemas.UserOut)
+USER_LIST_ADAPTER = TypeAdapter(List[schemas.UserOut])
+
+ARTICLE_FIELDS = tuple(schemas.ArticleOut.model_fields)
+USER_FIELDS = tuple(schemas.UserOut.model_fields)
+
+# Готовые наборы полей (view=...) — для виджетов заголовков и выпадающих списков
+ARTICLE_VIEWS: Dict[str, Tuple[str, ...]] = {
+    "summary": ("ArticleId", "Title", "CreatedAt"),
+    # Карточка списка: вместо Body — Excerpt
+    "card": ("ArticleId", "Title", "Excerpt", "StatusId", "Tags", "CreatedAt"),
+}
+USER_VIEWS: Dict[str, Tuple[str, ...]] = {"summary": ("UserId", "Login", "FirstName", "LastName")}
+
+
+def select_fields(fields: Optional[str], view: Optional[str], known: Tuple[str, ...],
+                  views: Dict[str, Tuple[str, ...]], key: str) -> Optional[Tuple[str, ...]]:
+    """Поля ответа из fields=a,b и/или view=имя, в порядке схемы; None — полный объект.
+
+    key (ArticleId/UserId) включается всегда — на нём держится keyset-курсор.
+    Неизвестное поле или вид — ValueError.
+    """
+    if not fields and not view:
+        return None
+    wanted = {key}
+    if view:
+        if view not in views:
+            raise ValueError(f"Неизвестный view: {view}; доступны: {', '.join(views)}")
+        wanted.update(views[view])
+    for name in (fields or "").split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in known:
+            raise ValueError(f"Неизвестное поле: {name}; доступны: {', '.join(known)}")
+        wanted.add(name)
+    return tuple(name for name in known if name in wanted)
+
+
+@lru_cache(maxsize=256)
+def projection_adapter(schema, fields: Tuple[str, ...]) -> TypeAdapter:
+    """TypeAdapter списка модели, урезанной до fields (собирается один раз на набор полей)."""
+    model = create_model(
+        f"{schema.__name__}Projection",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in fields},
+    )
+    return TypeAdapter(List[model])
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse с orjson вместо json.dumps (по умолчанию для всего приложения)."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def dump_json(obj) -> bytes:
+    return orjson.dumps(obj)
+
+
+def _author_dto(row) -> dict:
+    return {
+        "FirstName": row.FirstName,
+        "LastName": row.LastName,
+        "MiddleName": row.MiddleName,
+        "BirthDate": row.BirthDate,
+        "GenderId": row.GenderId,
+        "Email": row.Email,
+        "Login": row.Login,
+        "UserId": row.AuthorId,
+        "CreatedAt": row.AuthorCreatedAt,
+    }
+
+
+def _article_part(name: str, row, tags: Optional[List[dict]]):
+    if name == "Author":
+        return _author_dto(row)
+    if name == "Status":
+        return {"StatusId": row.StatusId, "Name": row.StatusName}
+    if name == "Tags":
+        return tags
+    return getattr(row, name)
+
+
+def article_dto(row, tags: Optional[List[dict]], fields: Optional[Tuple[str, ...]] = None) -> dict:
+    # row — строка crud._article_row_query (с теми же fields)
+    if fields is not None:
+        return {name: _article_part(name, row, tags) for name in fields}
+    return {
+        "AuthorId": row.AuthorId,
+        "Title": row.Title,
+        "Body": row.Body,
+        "StatusId": row.StatusId,
+        "ArticleId": row.ArticleId,
+        "Author": _author_dto(row),
+        "Status": {"StatusId": row.StatusId, "Name": row.StatusName},
+        "Tags": tags,
+        "CreatedAt": row.CreatedAt,
+        "UpdatedAt": row.UpdatedAt,
+        "Excerpt": row.Excerpt,
+    }
+
+
+def dump_article(article) -> bytes:
+    return ARTICLE_ADAPTER.dump_json(ARTICLE_ADAPTER.validate_python(article, from_attributes=True))
+
+
+def dump_articles(rows) -> bytes:
+    return ARTICLE_LIST_ADAPTER.dump_json(ARTICLE_LIST_ADAPTER.validate_python(rows, from_attributes=True))
+
+
+def dump_users(rows, fields: Optional[Tuple[str, ...]] = None) -> bytes:
+    adapter = USER_LIST_ADAPTER if fields is None else projection_adapter(schemas.UserOut, fields)
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
@@ -0,0 +1,30 @@
+"""bcrypt-хеширование паролей.
+
+Функции модуля выполняются в отдельных процессах (см. пул в app.utils.security),
+поэтому модуль лёгкий: только passlib и настройки, без FastAPI и БД.
+"""
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from app.config import settings
+
+
+@lru_cache(maxsize=1)
+def get_context():
+    from passlib.context import CryptContext
+
+    # deprecated="auto" + явный cost: хеши с другим числом раундов needs_update() == True
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+
+def hash_password(password: str) -> str:
+    return get_context().hash(password)
+
+
+def verify_and_update(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """(пароль верен, новый хеш, если cost изменился — иначе None)."""
+    try:
+        return get_context().verify_and_update(plain, hashed)
+    except ValueError:
+        # Не bcrypt-хеш (например, заглушка из демо-данных)
+        return False, None
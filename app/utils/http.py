@@ -0,0 +1,136 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, List, Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+# Кодировки, которыми CompressionMiddleware помечает ETag сжатого тела
+_ENCODING_SUFFIXES = tuple(f'-{encoding}"' for encoding in ("gzip", "br"))
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag сжатого представления: "x" -> "x-gzip" (W/ сохраняется).
+
+    У gzip- и br-тела другие байты, чем у несжатого, и сильный ETag у них
+    должен быть свой. If-Match по-прежнему сравнивает только версию (см.
+    if_match_versions), для If-None-Match суффикс снимает _etag_matches.
+    """
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Для If-None-Match сравнение слабое: W/"x" и "x-gzip" совпадают с "x"
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        for suffix in _ENCODING_SUFFIXES:
+            if candidate.endswith(suffix):
+                candidate = candidate[:-len(suffix)] + '"'
+                break
+        if candidate == bare:
+            return True
+    return False
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match имеет приоритет над If-Modified-Since (RFC 9110, 13.2.2)
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    *,
+    last_modified: Optional[datetime] = None,
+    cache_control: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+    media_type: str = "application/json",
+) -> Response:
+    """Готовый ответ с ETag/Last-Modified; 304 без тела, если клиентская копия актуальна."""
+    out = {"ETag": etag}
+    if last_modified is not None:
+        out["Last-Modified"] = http_date(last_modified)
+    if cache_control:
+        out["Cache-Control"] = cache_control
+    if headers:
+        out.update(headers)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=out)
+    return Response(content=body, media_type=media_type, headers=out)
+
+
+_VERSION_FORMAT = "%Y%m%d%H%M%S%f"
+
+
+def version_etag(key: int, version: Optional[datetime], body: Optional[bytes] = None) -> str:
+    """ETag из идентификатора и метки версии (UpdatedAt) для If-Match.
+
+    body — готовое тело ответа: к тегу добавляется его хеш. В тело входят и
+    данные, правка которых UpdatedAt статьи не сдвигает (автор, имя статуса,
+    Excerpt после backfill), и без хеша клиент получил бы 304 на устаревшую
+    копию. Для If-Match хеш не важен — сравнивается только версия.
+    """
+    stamp = version.strftime(_VERSION_FORMAT) if version else "0"
+    if body is not None:
+        stamp += "-" + hashlib.blake2b(body, digest_size=8).hexdigest()
+    return f'"{key}-{stamp}"'
+
+
+def if_match_versions(request: Request, key: int) -> Optional[List[Optional[datetime]]]:
+    """Версии из If-Match, выданные version_etag для key.
+
+    None — заголовка нет или он равен "*" (проверять нечего). Пустой список —
+    ни один тег не относится к текущей версии ресурса, запись должна получить 412.
+    None внутри списка — версия "0" (у строки нет ни UpdatedAt, ни CreatedAt).
+    """
+    header = request.headers.get("if-match")
+    if header is None:
+        return None
+    prefix = f'"{key}-'
+    versions: List[Optional[datetime]] = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return None
+        # If-Match — сильное сравнение, слабые теги (W/) не подходят (RFC 9110, 13.1.1)
+        if not (tag.startswith(prefix) and tag.endswith('"')):
+            continue
+        # Хеш тела после версии (version_etag с body) на проверку не влияет
+        stamp = tag[len(prefix):-1].partition("-")[0]
+        if stamp == "0":
+            versions.append(None)
+            continue
+        try:
+            versions.append(datetime.strptime(stamp, _VERSION_FORMAT))
+        except ValueError:
+            continue
+    return versions
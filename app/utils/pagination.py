@@ -0,0 +1,37 @@
+import base64
+import json
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+
+# Курсор непрозрачен для клиента: base64 от JSON с последним ключом страницы.
+def encode_cursor(last_id: int, **extra) -> str:
+    payload = {"id": last_id, **extra}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], **expected) -> Optional[int]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id = int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Некорректный cursor")
+    # Курсор выдан для других фильтров — продолжать с него нельзя
+    for key, value in expected.items():
+        if payload.get(key) != value:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Cursor не соответствует фильтрам")
+    return last_id
+
+
+def next_cursor(rows, key: str, limit: int, **extra) -> Optional[str]:
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    # Строки — ORM-объекты или DTO-словари из crud (as_dto=True)
+    value = last[key] if isinstance(last, dict) else getattr(last, key)
+    return encode_cursor(value, **extra)
@@ -1,34 +1,142 @@
-from passlib.context import CryptContext
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.database import get_db
 from app import models
+from app.cache import LRUCache
+from app.config import settings
+from app.utils import hashing
 
 # JWT
 SECRET_KEY = "CHANGE_THIS_SECRET"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return hashing.hash_password(password)
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    return hashing.verify_and_update(plain, hashed)[0]
+
+
+# Пул для bcrypt: ~250 мс CPU на вызов не должны занимать threadpool запросов.
+_hash_executor: ProcessPoolExecutor | None = None
+_hash_lock = threading.Lock()
+_hash_inflight = 0
+
+
+def _get_hash_executor() -> ProcessPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        with _hash_lock:
+            if _hash_executor is None:
+                _hash_executor = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _hash_executor
+
+
+def shutdown_hash_pool() -> None:
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
+async def _run_hashing(fn, *args):
+    global _hash_inflight
+    limit = max(settings.PASSWORD_HASH_WORKERS, 1) + settings.PASSWORD_HASH_QUEUE
+    with _hash_lock:
+        if _hash_inflight >= limit:
+            # Очередь переполнена — быстрый отказ вместо ожидания до таймаута клиента
+            raise HTTPException(
+                status_code=503, detail="Сервер перегружен, повторите позже", headers={"Retry-After": "1"}
+            )
+        _hash_inflight += 1
+    try:
+        if settings.PASSWORD_HASH_WORKERS <= 0:
+            return await run_in_threadpool(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(_get_hash_executor(), fn, *args)
+    finally:
+        with _hash_lock:
+            _hash_inflight -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(hashing.hash_password, password)
+
+
+async def verify_password_async(plain: str, hashed: str) -> tuple[bool, str | None]:
+    """(верен ли пароль, новый хеш при смене BCRYPT_ROUNDS или None)."""
+    return await _run_hashing(hashing.verify_and_update, plain, hashed)
+
+@dataclass(frozen=True)
+class Principal:
+    """Проверенный владелец токена — всё, что нужно роутам без обращения к User."""
+    user_id: int
+    login: str
+    expires_at: float
+    epoch: int = 0
+
+
+# token -> Principal. Эпоха пользователя растёт при изменении профиля/пароля,
+# и все ранее закэшированные токены этого пользователя перестают считаться проверенными.
+_principal_cache = LRUCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL)
+_user_epochs: dict = {}
+_epochs_lock = threading.Lock()
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
+    # python-jose (и cryptography под ним) — при первом токене, а не при старте воркера
+    from jose import jwt
+
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> models.User:
+def create_user_token(user: models.User) -> str:
+    claims = {"sub": user.Login}
+    if settings.TOKEN_EMBED_CLAIMS:
+        # С uid в токене проверка при промахе кэша — поиск по PK
+        claims["uid"] = user.UserId
+    return create_access_token(claims)
+
+def invalidate_principal(login: str) -> None:
+    with _epochs_lock:
+        _user_epochs[login] = _user_epochs.get(login, 0) + 1
+
+def token_subject(token: str) -> str | None:
+    """Логин из проверенного токена без обращения к БД (ключ для лимитов запросов)."""
+    principal = _principal_cache.get(token)
+    if principal is not None:
+        return principal.login
+    from jose import JWTError, jwt
+
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub") or None
+    except JWTError:
+        return None
+
+def get_current_principal(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> Principal:
     credentials_exception = HTTPException(status_code=401, detail="Could not validate credentials")
+    principal = _principal_cache.get(token)
+    if principal is not None:
+        if principal.expires_at > time.time() and principal.epoch == _user_epochs.get(principal.login, 0):
+            return principal
+        _principal_cache.invalidate(token)
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         login: str = payload.get("sub")
@@ -36,7 +144,25 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.Login == login).first()
-    if not user:
+    epoch = _user_epochs.get(login, 0)
+    # Промах кэша (раз на токен за PRINCIPAL_CACHE_TTL): логин сверяется с БД, иначе токен,
+    # выданный до смены Login, после invalidate_principal просто закэшировался бы заново
+    query = db.query(models.User.UserId).filter(models.User.Login == login)
+    user_id = payload.get("uid") if settings.TOKEN_EMBED_CLAIMS else None
+    if user_id is not None:
+        query = query.filter(models.User.UserId == int(user_id))
+    row = query.first()
+    if not row:
+        raise credentials_exception
+    user_id = row[0]
+    principal = Principal(user_id=int(user_id), login=login, expires_at=float(payload["exp"]), epoch=epoch)
+    _principal_cache.set(token, principal)
+    return principal
+
+def get_current_user(db: Session = Depends(get_db), principal: Principal = Depends(get_current_principal)) -> models.User:
+    credentials_exception = HTTPException(status_code=401, detail="Could not validate credentials")
+    # Поиск по PK; если в этой сессии пользователь уже загружен — без запроса
+    user = db.get(models.User, principal.user_id)
+    if not user or user.Login != principal.login:
         raise credentials_exception
     return user
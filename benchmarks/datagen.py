@@ -0,0 +1,136 @@
+"""Синтетические данные для бенчмарков: пользователи, статьи, теги и блобы.
+
+Генерация детерминирована (seed), так что прогоны на разных коммитах
+сравнимы между собой.
+"""
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.crud import make_excerpt
+from app.utils import hashing
+
+WORDS = (
+    "esp32 stm32 rp2040 arduino raspberry pi gpio uart spi i2c dma timer adc dac pwm "
+    "bootloader firmware flash sram eeprom rtos freertos zephyr wifi bluetooth lora "
+    "sensor driver datasheet errata clock watchdog interrupt peripheral usb can "
+    "микроконтроллер прошивка плата датчик питание отладка модуль"
+).split()
+
+BENCH_PASSWORD = "bench-password"
+
+
+@dataclass
+class DataSpec:
+    users: int = 50
+    articles: int = 2000
+    tags: int = 20
+    tags_per_article: int = 3
+    body_words: int = 300
+    image_bytes: int = 0
+    photo_bytes: int = 0
+    published_share: float = 0.8
+    seed: int = 42
+
+
+def _text(rng: random.Random, n: int) -> str:
+    lines = []
+    for start in range(0, n, 12):
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(min(12, n - start))))
+    return "\n".join(lines)
+
+
+def _blob(rng: random.Random, size: int):
+    if not size:
+        return None
+    # Сигнатура PNG, чтобы /image отдавал image/png; остальное — шум
+    return b"\x89PNG\r\n\x1a\n" + rng.randbytes(max(0, size - 8))
+
+
+def _pick_tags(rng: random.Random, tag_ids: list, count: int) -> set:
+    # Распределение с перекосом (Парето): первые теги встречаются заметно чаще
+    return {tag_ids[min(int(rng.paretovariate(1.2)) - 1, len(tag_ids) - 1)] for _ in range(count)}
+
+
+def _ensure_reference(db: Session, spec: DataSpec) -> None:
+    if not db.query(models.Gender).count():
+        db.add_all([models.Gender(GenderId=1, Name="Male"), models.Gender(GenderId=2, Name="Female")])
+    if not db.query(models.ArticleStatus).count():
+        db.add_all([
+            models.ArticleStatus(StatusId=1, Name="Draft"),
+            models.ArticleStatus(StatusId=2, Name="Published"),
+        ])
+    existing = {name for (name,) in db.query(models.Tag.Name)}
+    for i in range(spec.tags):
+        name = WORDS[i % len(WORDS)].upper() if i < len(WORDS) else f"TAG{i}"
+        if name not in existing:
+            db.add(models.Tag(Name=name))
+            existing.add(name)
+    db.commit()
+
+
+def generate(db: Session, spec: DataSpec) -> dict:
+    """Заполняет пустую базу и возвращает сведения, нужные сценариям (логины, id)."""
+    rng = random.Random(spec.seed)
+    _ensure_reference(db, spec)
+    tag_ids = [tag_id for (tag_id,) in db.query(models.Tag.TagId).order_by(models.Tag.TagId)]
+    password_hash = hashing.hash_password(BENCH_PASSWORD)
+
+    user_rows = [
+        {
+            "FirstName": f"User{i}",
+            "LastName": "Bench",
+            "BirthDate": date(1980, 1, 1) + timedelta(days=i),
+            "GenderId": 1 + i % 2,
+            "Email": f"bench{i}@example.com",
+            "Login": f"bench{i}",
+            "PasswordHash": password_hash,
+            "Photo": _blob(rng, spec.photo_bytes),
+            "CreatedAt": datetime.utcnow(),
+        }
+        for i in range(spec.users)
+    ]
+    user_ids = db.scalars(
+        insert(models.User).returning(models.User.UserId, sort_by_parameter_order=True), user_rows
+    ).all()
+
+    started = datetime.utcnow() - timedelta(days=spec.articles // 10 + 1)
+    article_ids = []
+    for offset in range(0, spec.articles, 1000):
+        rows = []
+        for i in range(offset, min(offset + 1000, spec.articles)):
+            created = started + timedelta(minutes=15 * i)
+            body = _text(rng, spec.body_words)
+            rows.append({
+                "AuthorId": rng.choice(user_ids),
+                "Title": " ".join(rng.choice(WORDS) for _ in range(6))[:100],
+                "Body": body,
+                "Excerpt": make_excerpt(body),
+                "Image": _blob(rng, spec.image_bytes),
+                "StatusId": 2 if rng.random() < spec.published_share else 1,
+                "CreatedAt": created,
+                "UpdatedAt": created,
+            })
+        ids = db.scalars(
+            insert(models.Article).returning(models.Article.ArticleId, sort_by_parameter_order=True), rows
+        ).all()
+        tag_rows = [
+            {"ArticleId": article_id, "TagId": tag_id}
+            for article_id in ids
+            for tag_id in _pick_tags(rng, tag_ids, spec.tags_per_article)
+        ]
+        if tag_rows:
+            db.execute(insert(models.article_tag), tag_rows)
+        article_ids.extend(ids)
+    db.commit()
+    return {
+        "user_ids": list(user_ids),
+        "article_ids": article_ids,
+        "tag_ids": tag_ids,
+        "logins": [row["Login"] for row in user_rows],
+        "password": BENCH_PASSWORD,
+    }
@@ -0,0 +1,216 @@
+"""Бенчмарк роутеров на SQLite вместо SQL Server.
+
+Запуск (из корня репозитория)::
+
+    python -m benchmarks.run --articles 5000 --requests 300 --out bench.json
+
+Приложение поднимается в процессе (TestClient), база — временный файл SQLite,
+подставленный через DATABASE_URL до импорта app. Для каждого сценария
+считаются пропускная способность, p50/p95/p99 задержки и число SQL-запросов на
+запрос. Результат — JSON с метаданными прогона (коммит, параметры), чтобы
+сравнивать прогоны между коммитами. Переменные окружения приложения
+(ARTICLE_CACHE_SIZE=0 для «холодных» прогонов, PDF_WORKERS, BCRYPT_ROUNDS...)
+передаются как обычно.
+
+Ответы 4xx/5xx считаются ошибками: быстрый отказ — не результат. Число ошибок
+и их коды печатаются по каждому сценарию, и при любой ошибке прогон
+завершается с кодом 1 (отчёт при этом всё равно записывается).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class QueryCounter:
+    def __init__(self, engines):
+        from sqlalchemy import event
+
+        self.count = 0
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def build_scenarios(ctx, rng):
+    article_ids = ctx["article_ids"]
+    tag_ids = ctx["tag_ids"]
+    words = ["esp", "stm32 dma", "raspberry pi", "прошивка", "uart driver"]
+
+    def login_body():
+        return {"Login": rng.choice(ctx["logins"]), "Password": ctx["password"]}
+
+    return {
+        "list": lambda: ("GET", f"/articles/?limit=20&skip={rng.randrange(0, 200)}", None),
+        "list_all_deep": lambda: ("GET", f"/articles/all?limit=20&skip={rng.randrange(0, max(1, len(article_ids) - 20))}", None),
+        "detail": lambda: ("GET", f"/articles/{rng.choice(article_ids)}", None),
+        "search": lambda: ("GET", f"/articles/?limit=20&search={rng.choice(words)}", None),
+        "tag_filter": lambda: ("GET", f"/articles/?limit=20&tag_id={rng.choice(tag_ids)}", None),
+        "users": lambda: ("GET", "/users/?limit=50", None),
+        "tags": lambda: ("GET", "/tags/", None),
+        "pdf": lambda: ("GET", f"/articles/{rng.choice(article_ids)}/pdf", None),
+        "login": lambda: ("POST", "/auth/login", login_body()),
+    }
+
+
+def run_scenario(client, counter, make_request, requests, headers):
+    latencies = []
+    queries = []
+    errors = Counter()
+    started = time.perf_counter()
+    for _ in range(requests):
+        method, url, body = make_request()
+        counter.count = 0
+        t0 = time.perf_counter()
+        response = client.request(method, url, json=body, headers=headers)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        queries.append(counter.count)
+        if response.status_code >= 400:
+            errors[response.status_code] += 1
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": sum(errors.values()),
+        "error_statuses": {str(code): n for code, n in sorted(errors.items())},
+        "throughput_rps": round(requests / elapsed, 2),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(_percentile(latencies, 0.50), 3),
+        "p95_ms": round(_percentile(latencies, 0.95), 3),
+        "p99_ms": round(_percentile(latencies, 0.99), 3),
+        "queries_per_request": round(statistics.fmean(queries), 2),
+        "max_queries": max(queries),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--tags", type=int, default=20)
+    parser.add_argument("--body-words", type=int, default=300)
+    parser.add_argument("--image-bytes", type=int, default=0)
+    parser.add_argument("--photo-bytes", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=200, help="запросов на сценарий")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--scenarios", default="", help="через запятую; по умолчанию все")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", default="", help="путь к файлу SQLite (по умолчанию временный)")
+    parser.add_argument("--out", default="bench_output.json")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="mcnews-bench-")
+    db_path = args.db or os.path.join(workdir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("BCRYPT_ROUNDS", "10")
+    # Один клиент шлёт сотни запросов подряд: с лимитами по умолчанию pdf и login
+    # мерили бы скорость отказа 429. ADMISSION_ENABLED=1 — замер с включённым допуском
+    os.environ.setdefault("ADMISSION_ENABLED", "0")
+
+    # Импорт приложения — только после того, как DATABASE_URL указывает на SQLite
+    from fastapi.testclient import TestClient
+
+    from app import database
+    from app.database import Base, SessionLocal, engine
+    from app.main import app
+    from app.utils.security import create_user_token
+    from app import models
+    from benchmarks.datagen import DataSpec, generate
+
+    Base.metadata.create_all(bind=engine)
+    spec = DataSpec(
+        users=args.users, articles=args.articles, tags=args.tags, body_words=args.body_words,
+        image_bytes=args.image_bytes, photo_bytes=args.photo_bytes, seed=args.seed,
+    )
+    t0 = time.perf_counter()
+    with SessionLocal() as db:
+        ctx = generate(db, spec)
+        token = create_user_token(db.get(models.User, ctx["user_ids"][0]))
+    datagen_seconds = time.perf_counter() - t0
+
+    engines = [engine] + ([database.async_engine.sync_engine] if database.async_engine is not None else [])
+    counter = QueryCounter(engines)
+    rng = random.Random(args.seed)
+    scenarios = build_scenarios(ctx, rng)
+    selected = [s for s in args.scenarios.split(",") if s] or list(scenarios)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    results = {}
+    with TestClient(app) as client:
+        for name in selected:
+            make_request = scenarios[name]
+            for _ in range(args.warmup):
+                method, url, body = make_request()
+                client.request(method, url, json=body, headers=headers)
+            result = results[name] = run_scenario(client, counter, make_request, args.requests, headers)
+            statuses = ", ".join(f"{code}x{n}" for code, n in result["error_statuses"].items())
+            print(f"{name:15s} {result['throughput_rps']:9.1f} rps  "
+                  f"p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+                  f"p99 {result['p99_ms']:8.2f} ms  q/req {result['queries_per_request']}  "
+                  f"errors {result['errors']}" + (f" ({statuses})" if statuses else ""))
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "params": vars(args),
+            "env": {k: os.environ[k] for k in sorted(_APP_ENV) if k in os.environ},
+            "datagen_seconds": round(datagen_seconds, 3),
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, ensure_ascii=False, indent=2)
+    print(f"-> {args.out}")
+    if not args.db:
+        engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+# Переменные окружения приложения, которые попадают в отчёт (влияют на результаты)
+_APP_ENV = {
+    "ASYNC_DB_ENABLED", "ARTICLE_CACHE_SIZE", "ARTICLE_CACHE_TTL", "PDF_WORKERS", "PDF_CACHE_SIZE",
+    "BCRYPT_ROUNDS", "PASSWORD_HASH_WORKERS", "SEARCH_BACKEND", "TOKEN_EMBED_CLAIMS", "DB_POOL_SIZE",
+    "ADMISSION_ENABLED",
+}
+
+
+def failed_scenarios(report) -> list:
+    return [name for name, result in report["results"].items() if result["errors"]]
+
+
+if __name__ == "__main__":
+    failed = failed_scenarios(main())
+    if failed:
+        print("errors in: " + ", ".join(failed), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,103 @@
+"""Стоимость сериализации списка статей в пересчёте на строку.
+
+Запуск (из корня репозитория)::
+
+    python -m benchmarks.serialization --articles 2000 --page 100 --repeat 50
+
+Сравниваются три пути для одной и той же страницы:
+
+* ``legacy``  — ORM + response_model: валидация pydantic from_attributes,
+  jsonable_encoder и json.dumps (как раньше делал FastAPI);
+* ``adapter`` — ORM + предкомпилированный TypeAdapter.dump_json;
+* ``dto``     — плоские строки запроса (crud.get_articles(as_dto=True)) + orjson.
+
+Для каждого пути — время «запрос + сериализация» и отдельно только
+сериализации (строки получены заранее), в микросекундах на строку.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+
+def _per_row_us(fn, repeat: int, rows: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples) / rows * 1e6, 2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--body-words", type=int, default=300)
+    parser.add_argument("--page", type=int, default=100, help="строк на страницу")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="mcnews-ser-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+    from fastapi.encoders import jsonable_encoder
+
+    from app import crud
+    from app.database import Base, SessionLocal, engine
+    from app.serialization import ARTICLE_LIST_ADAPTER, dump_articles, dump_json
+    from benchmarks.datagen import DataSpec, generate
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        generate(db, DataSpec(articles=args.articles, body_words=args.body_words, seed=args.seed))
+
+    def legacy(rows):
+        validated = ARTICLE_LIST_ADAPTER.validate_python(rows, from_attributes=True)
+        return json.dumps(jsonable_encoder(validated), ensure_ascii=False).encode()
+
+    page = args.page
+    results = {}
+    try:
+        with SessionLocal() as db:
+            orm_rows = crud.get_articles(db, limit=page)
+            dto_rows = crud.get_articles(db, limit=page, as_dto=True)
+            # Пути должны давать одно и то же тело (и, значит, тот же ETag)
+            if dump_json(dto_rows) != dump_articles(orm_rows):
+                raise SystemExit("dto и adapter дают разные тела ответа")
+            page = len(orm_rows)
+
+            def fetch_orm():
+                db.expunge_all()
+                return crud.get_articles(db, limit=page)
+
+            results["legacy"] = {
+                "query_and_serialize_us": _per_row_us(lambda: legacy(fetch_orm()), args.repeat, page),
+                "serialize_us": _per_row_us(lambda: legacy(orm_rows), args.repeat, page),
+            }
+            results["adapter"] = {
+                "query_and_serialize_us": _per_row_us(lambda: dump_articles(fetch_orm()), args.repeat, page),
+                "serialize_us": _per_row_us(lambda: dump_articles(orm_rows), args.repeat, page),
+            }
+            results["dto"] = {
+                "query_and_serialize_us": _per_row_us(
+                    lambda: dump_json(crud.get_articles(db, limit=page, as_dto=True)), args.repeat, page
+                ),
+                "serialize_us": _per_row_us(lambda: dump_json(dto_rows), args.repeat, page),
+            }
+    finally:
+        engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for name, row in results.items():
+        print(f"{name:8s} query+serialize {row['query_and_serialize_us']:9.2f} us/row   "
+              f"serialize {row['serialize_us']:9.2f} us/row")
+    return results
+
+
+if __name__ == "__main__":
+    main()
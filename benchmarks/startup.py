@@ -0,0 +1,105 @@
+"""Время старта воркера: импорт app.main и первый ответ.
+
+Запуск (из корня репозитория)::
+
+    python -m benchmarks.startup --runs 10 --out startup.json
+
+Каждый прогон — отдельный процесс с холодным sys.modules (как при спавне
+воркера). Меряются импорт app.main, запуск lifespan и первый GET /tags/.
+Дополнительно ``-X importtime`` даёт самые дорогие модули — по ним видно,
+не вернулся ли в импорт тяжёлый модуль (reportlab, jose, passlib, PIL).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Выполняется в дочернем процессе; печатает одну JSON-строку
+_PROBE = """
+import json, time
+t0 = time.perf_counter()
+import app.main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    t2 = time.perf_counter()
+    status = client.get("/tags/").status_code
+    t3 = time.perf_counter()
+heavy = [m for m in ("reportlab", "jose", "passlib", "PIL") if m in __import__("sys").modules]
+print(json.dumps({"import": t1 - t0, "lifespan": t2 - t1, "first_request": t3 - t2,
+                  "status": status, "heavy_modules": heavy}))
+"""
+
+
+def _env(db_path: str) -> dict:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{db_path}"
+    env.setdefault("PYTHONPATH", os.getcwd())
+    return env
+
+
+def _top_imports(env: dict, top: int):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue  # строка заголовка
+        rows.append((cumulative, parts[2].strip()))
+    rows.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in rows[:top]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15, help="сколько модулей из -X importtime показать")
+    parser.add_argument("--out", default="")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="mcnews-startup-") as workdir:
+        db_path = os.path.join(workdir, "startup.db")
+        env = _env(db_path)
+        subprocess.run([sys.executable, "-m", "app.cli", "init-db"], env=env, check=True, capture_output=True)
+
+        samples = []
+        for _ in range(args.runs):
+            out = subprocess.run([sys.executable, "-c", _PROBE], env=env, capture_output=True, text=True, check=True)
+            samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        top = _top_imports(env, args.top)
+
+    summary = {
+        phase: {
+            "median_ms": round(statistics.median(s[phase] for s in samples) * 1000, 1),
+            "max_ms": round(max(s[phase] for s in samples) * 1000, 1),
+        }
+        for phase in ("import", "lifespan", "first_request")
+    }
+    report = {
+        "runs": args.runs,
+        "phases": summary,
+        "heavy_modules_loaded": sorted({m for s in samples for m in s["heavy_modules"]}),
+        "top_imports": top,
+    }
+    for phase, row in summary.items():
+        print(f"{phase:14s} median {row['median_ms']:8.1f} ms   max {row['max_ms']:8.1f} ms")
+    print("heavy modules at startup:", ", ".join(report["heavy_modules_loaded"]) or "none")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+        print(f"-> {args.out}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Общие настройки тестов: SQLite вместо SQL Server, без фоновых потоков и пулов процессов.
+
+Переменные окружения задаются до импорта app — настройки и движок создаются при импорте.
+"""
+import os
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+_TMP = tempfile.mkdtemp(prefix="mcnews-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP, 'primary.db')}"
+os.environ["REPLICA_DATABASE_URLS"] = ""
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+os.environ.setdefault("PDF_WORKERS", "0")
+os.environ.setdefault("COUNTERS_ENABLED", "0")
+os.environ.setdefault("BITMAP_WARMUP", "0")
+os.environ.setdefault("SEARCH_WARMUP", "0")
+os.environ.setdefault("ADMISSION_ENABLED", "0")
+
+from app import models  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.utils.security import create_user_token  # noqa: E402
+from benchmarks.datagen import DataSpec, generate  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def tmp_dir():
+    return _TMP
+
+
+@pytest.fixture(scope="session")
+def seeded():
+    """Схема и синтетические данные в основной тестовой базе (один раз на сессию)."""
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        ctx = generate(db, DataSpec(users=5, articles=150, tags=8, body_words=30))
+    return ctx
+
+
+@pytest.fixture(scope="session")
+def auth(seeded):
+    """Заголовок Authorization первого пользователя из seeded."""
+    with SessionLocal() as db:
+        token = create_user_token(db.get(models.User, seeded["user_ids"][0]))
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def client(seeded):
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,59 @@
+"""Допуск к дорогим маршрутам: 429 по bucket'у ключа, 503 по параллельности, ключ Login + IP."""
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from app.admission import AdmissionMiddleware
+
+# (параллельность, запросов в минуту, burst) — как settings.ROUTE_LIMITS
+LIMITS = {"search": (1, 60, 2), "auth": (0, 60, 1)}
+
+
+async def echo(scope, receive, send):
+    # Приложение за middleware: тело должно дойти до него нетронутым
+    body = await Request(scope, receive).body()
+    await JSONResponse({"body": body.decode()})(scope, receive, send)
+
+
+@pytest.fixture
+def admission():
+    middleware = AdmissionMiddleware(echo, limits=LIMITS)
+    return middleware, TestClient(middleware)
+
+
+def test_rate_limit_returns_429_with_retry_after(admission):
+    _, client = admission
+    assert [client.get("/articles/", params={"search": "esp"}).status_code for _ in range(2)] == [200, 200]
+    rejected = client.get("/articles/", params={"search": "esp"})
+    assert rejected.status_code == 429
+    assert int(rejected.headers["Retry-After"]) >= 1
+
+
+def test_cheap_reads_are_not_limited(admission):
+    _, client = admission
+    assert {client.get("/articles/").status_code for _ in range(10)} == {200}
+    assert {client.get("/articles/", params={"search": " "}).status_code for _ in range(10)} == {200}
+
+
+def test_saturated_group_returns_503_without_spending_a_token(admission):
+    middleware, client = admission
+    limiter = middleware.limiters["search"]
+    limiter.in_flight = limiter.concurrency
+    try:
+        busy = client.get("/articles/", params={"search": "esp"})
+    finally:
+        limiter.in_flight = 0
+    assert busy.status_code == 503
+    assert busy.headers["Retry-After"] == "1"
+    assert [client.get("/articles/", params={"search": "esp"}).status_code for _ in range(2)] == [200, 200]
+
+
+def test_login_limit_is_per_login_and_body_reaches_app(admission):
+    _, client = admission
+    first = client.post("/auth/login", json={"Login": "alice", "Password": "x"})
+    assert first.status_code == 200
+    assert '"alice"' in first.json()["body"]
+    assert client.post("/auth/login", json={"Login": "ALICE", "Password": "y"}).status_code == 429
+    # Соседний логин за тем же IP не делит bucket
+    assert client.post("/auth/login", json={"Login": "bob", "Password": "x"}).status_code == 200
@@ -0,0 +1,11 @@
+"""Картинка, переданная при создании статьи, отдаётся через /articles/{id}/image."""
+IMAGE = "GIF89a-test-image-bytes"
+
+
+def test_image_from_create_is_served(client, auth):
+    article = {"AuthorId": 1, "Title": "С картинкой", "Body": "Текст", "StatusId": 2, "Image": IMAGE}
+    created = client.post("/articles/", json=article, headers=auth)
+    assert created.status_code == 201
+    image = client.get(f"/articles/{created.json()['ArticleId']}/image")
+    assert image.status_code == 200
+    assert image.content == IMAGE.encode()
@@ -0,0 +1,91 @@
+"""Выражения по тегам: разбор, результаты битового индекса и SQL-фолбэк на время перестройки."""
+import pytest
+from sqlalchemy.orm import Session
+
+from app import bitmap, crud, models
+from app.database import engine
+
+
+@pytest.mark.parametrize("expression, tree", [
+    ("ESP32", ("tag", "ESP32")),
+    ("7", ("tag", 7)),
+    ('"Raspberry Pi"', ("tag", "Raspberry Pi")),
+    ("A OR B AND NOT C", ("or", ("tag", "A"), ("and", ("tag", "B"), ("not", ("tag", "C"))))),
+    ("(A or B) and c", ("and", ("or", ("tag", "A"), ("tag", "B")), ("tag", "c"))),
+    ("NOT NOT A", ("not", ("not", ("tag", "A")))),
+])
+def test_parse(expression, tree):
+    assert bitmap.parse(expression) == tree
+
+
+@pytest.mark.parametrize("expression", ["", "A AND", "(A OR B", "A B", "AND A", "A )"])
+def test_parse_errors(expression):
+    with pytest.raises(ValueError):
+        bitmap.parse(expression)
+
+
+@pytest.fixture(scope="module")
+def tagging(seeded):
+    """ArticleId -> множество имён тегов и список имён — ожидаемые результаты считаются без индекса."""
+    with Session(bind=engine) as db:
+        names = dict(db.query(models.Tag.TagId, models.Tag.Name))
+        article_ids = [row[0] for row in db.query(models.Article.ArticleId)]
+        links = db.query(models.article_tag.c.ArticleId, models.article_tag.c.TagId).all()
+    tags = {article_id: set() for article_id in article_ids}
+    for article_id, tag_id in links:
+        tags[article_id].add(names[tag_id])
+    return tags, sorted(names.values())
+
+
+def _expected(tagging, predicate) -> list:
+    tags, _ = tagging
+    return sorted(article_id for article_id, names in tags.items() if predicate(names))
+
+
+def _cases(tagging):
+    _, (a, b, c, *_) = tagging
+    return [
+        (a, lambda t: a in t),
+        (f"{a} AND {b}", lambda t: a in t and b in t),
+        (f"{a} OR {b} AND NOT {c}", lambda t: a in t or (b in t and c not in t)),
+        (f"NOT ({a} OR {b})", lambda t: a not in t and b not in t),
+        (f"{a.lower()} AND NOT {c}", lambda t: a in t and c not in t),
+    ]
+
+
+def _ids(db, expression) -> list:
+    return [row["ArticleId"] for row in crud.get_articles(db, limit=10000, as_dto=True, tag_expr=expression)]
+
+
+def test_bitmap_matches_tag_links(tagging):
+    with Session(bind=engine) as db:
+        for expression, predicate in _cases(tagging):
+            assert _ids(db, expression) == _expected(tagging, predicate), expression
+
+
+def test_sql_fallback_while_index_is_rebuilt(tagging, monkeypatch):
+    # Индекса нет, а блокировку держит другой поток: запрос не ждёт и фильтрует в SQL
+    monkeypatch.setattr(bitmap.index, "ready", False)
+    assert bitmap._rebuild_lock.acquire(blocking=False)
+    try:
+        with Session(bind=engine) as db:
+            for expression, predicate in _cases(tagging):
+                assert _ids(db, expression) == _expected(tagging, predicate), expression
+            with pytest.raises(bitmap.IndexNotReady):
+                crud.article_facets(db, _cases(tagging)[0][0])
+    finally:
+        bitmap._rebuild_lock.release()
+
+
+def test_facets_count_matches(tagging):
+    _, (a, b, *_) = tagging
+    with Session(bind=engine) as db:
+        facets = crud.article_facets(db, a)
+    assert facets["total"] == len(_expected(tagging, lambda t: a in t))
+    by_name = {tag["Name"]: tag["Count"] for tag in facets["tags"]}
+    assert by_name[b] == len(_expected(tagging, lambda t: a in t and b in t))
+
+
+def test_unknown_tag_and_bad_syntax_return_400(client):
+    assert client.get("/articles/", params={"tags": "NOSUCHTAG"}).status_code == 400
+    assert client.get("/articles/", params={"tags": "(A OR"}).status_code == 400
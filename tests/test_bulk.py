@@ -0,0 +1,67 @@
+"""POST /articles/bulk: JSON-массив и поток NDJSON, лимит BULK_MAX_ITEMS, ошибки по элементам."""
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from app import models
+from app.config import settings
+from app.database import engine
+
+NDJSON = {"Content-Type": "application/x-ndjson"}
+
+
+def _item(n: int, **overrides) -> dict:
+    return {"AuthorId": 1, "Title": f"Пакетная {n}", "Body": f"Текст {n}", "StatusId": 2, **overrides}
+
+
+def _article_count() -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(models.Article)).scalar_one()
+
+
+@pytest.fixture
+def max_items(monkeypatch):
+    monkeypatch.setattr(settings, "BULK_MAX_ITEMS", 3)
+    return 3
+
+
+def test_json_array_creates_and_reports_per_item(client, auth):
+    items = [_item(1), _item(2, StatusId=999), _item(3, Title=None), _item(4, TagIds=[999999])]
+    before = _article_count()
+    response = client.post("/articles/bulk", json=items, headers=auth)
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["created"], data["failed"]) == (1, 3)
+    assert [r["status"] for r in data["items"]] == ["created", "error", "error", "error"]
+    assert [r["index"] for r in data["items"]] == [0, 1, 2, 3]
+    assert _article_count() == before + 1
+
+
+def test_json_array_over_limit_is_rejected_whole(client, auth, max_items):
+    before = _article_count()
+    response = client.post("/articles/bulk", json=[_item(n) for n in range(max_items + 1)], headers=auth)
+    assert response.status_code == 413
+    assert _article_count() == before
+
+
+def test_ndjson_over_limit_loads_head_and_rejects_tail(client, auth, max_items):
+    before = _article_count()
+    lines = "\n".join(json.dumps(_item(n)) for n in range(max_items + 2))
+    response = client.post("/articles/bulk", content=lines.encode(), headers={**auth, **NDJSON})
+    assert response.status_code == 200
+    statuses = [r["status"] for r in response.json()["items"]]
+    assert statuses == ["created"] * max_items + ["rejected"] * 2
+    assert _article_count() == before + max_items
+
+
+def test_ndjson_bad_line_does_not_stop_the_stream(client, auth):
+    body = b"\n".join([json.dumps(_item(1)).encode(), b"{not json", b"", json.dumps(_item(2)).encode()])
+    response = client.post("/articles/bulk", content=body, headers={**auth, **NDJSON})
+    assert [r["status"] for r in response.json()["items"]] == ["created", "error", "created"]
+
+
+@pytest.mark.parametrize("body", [b"{not json", b'{"Title": "not an array"}'])
+def test_non_array_json_returns_400(client, auth, body):
+    response = client.post("/articles/bulk", content=body, headers={**auth, "Content-Type": "application/json"})
+    assert response.status_code == 400
@@ -0,0 +1,101 @@
+"""Сжатие ответов (выбор кодировки, что сжимается, ETag) и хранение Body."""
+import pytest
+from fastapi.testclient import TestClient
+from starlette.responses import Response
+
+from app import compression
+from app.compression import CompressionMiddleware, decode_body, encode_body, negotiate
+from app.config import settings
+from app.utils.http import encoded_etag
+
+LARGE = "статья " * 500
+
+
+@pytest.fixture
+def gzip_only(monkeypatch):
+    # br зависит от необязательного пакета brotli — выбор проверяем без него
+    monkeypatch.setattr(compression, "brotli", None)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", "gzip"),
+    ("gzip, deflate", "gzip"),
+    ("GZIP;q=0.5", "gzip"),
+    ("*", "gzip"),
+    ("gzip;q=0", None),
+    ("*;q=0", None),
+    ("deflate, identity", None),
+    ("", None),
+    ("br", None),
+])
+def test_negotiate_gzip(gzip_only, header, expected):
+    assert negotiate(header) == expected
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="пакет brotli не установлен")
+@pytest.mark.parametrize("header, expected", [("br, gzip", "br"), ("br;q=0.5, gzip", "gzip"), ("*", "br")])
+def test_negotiate_br(header, expected):
+    assert negotiate(header) == expected
+
+
+def _client(content: str, media_type: str = "application/json", **headers) -> TestClient:
+    async def app(scope, receive, send):
+        await Response(content, media_type=media_type, headers=headers)(scope, receive, send)
+    return TestClient(CompressionMiddleware(app, minimum_size=1024))
+
+
+@pytest.mark.parametrize("media_type", ["application/json", "text/csv", "application/problem+json"])
+def test_large_text_is_gzipped(gzip_only, media_type):
+    response = _client(LARGE, media_type).get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) < len(LARGE.encode())
+    assert response.text == LARGE
+
+
+@pytest.mark.parametrize("content, media_type, accept", [
+    ("мало", "application/json", "gzip"),
+    (LARGE, "image/png", "gzip"),
+    (LARGE, "text/event-stream", "gzip"),
+    (LARGE, "application/json", "identity"),
+])
+def test_left_uncompressed(gzip_only, content, media_type, accept):
+    response = _client(content, media_type).get("/", headers={"Accept-Encoding": accept})
+    assert "Content-Encoding" not in response.headers
+
+
+def test_compressed_response_gets_its_own_etag(gzip_only):
+    client = _client(LARGE, ETag='"7-1-abc"')
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["ETag"] == '"7-1-abc-gzip"'
+    plain = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert plain.headers["ETag"] == '"7-1-abc"'
+
+
+def test_gzip_etag_revalidates_and_passes_if_match(gzip_only, client, auth):
+    url = "/articles/all?limit=100"
+    listed = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert listed.headers["Content-Encoding"] == "gzip"
+    etag = listed.headers["ETag"]
+    assert etag.endswith('-gzip"')
+    assert client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={"Accept-Encoding": "identity", "If-None-Match": etag}).status_code == 304
+
+    # If-Match сравнивает версию: тег сжатого ответа для правки годится
+    article_id = listed.json()[0]["ArticleId"]
+    detail = client.get(f"/articles/{article_id}", headers={"Accept-Encoding": "identity"})
+    updated = client.put(f"/articles/{article_id}", json={"Title": detail.json()["Title"]},
+                         headers={**auth, "If-Match": encoded_etag(detail.headers["ETag"], "gzip")})
+    assert updated.status_code == 200
+
+
+@pytest.mark.parametrize("codec", ["zlib", "off"])
+def test_body_roundtrip(monkeypatch, codec):
+    monkeypatch.setattr(settings, "BODY_COMPRESSION", codec)
+    stored = encode_body(LARGE)
+    assert decode_body(stored) == LARGE
+    assert (stored != LARGE) == (codec == "zlib")
+    # Короткий текст не сжимается, старые несжатые строки читаются как есть
+    assert encode_body("коротко") == "коротко"
+    assert decode_body("обычный текст") == "обычный текст"
+
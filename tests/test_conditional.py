@@ -0,0 +1,67 @@
+"""ETag/304 на чтении и If-Match/412 на правке и удалении статьи."""
+import pytest
+
+ARTICLE = {"AuthorId": 1, "Title": "Версионируемая", "Body": "Первая версия", "StatusId": 1}
+IDENTITY = {"Accept-Encoding": "identity"}
+
+
+@pytest.fixture
+def article(client, auth):
+    created = client.post("/articles/", json=ARTICLE, headers=auth)
+    assert created.status_code == 201
+    return created.json()["ArticleId"]
+
+
+def test_if_none_match_returns_304(client, article):
+    first = client.get(f"/articles/{article}", headers=IDENTITY)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    again = client.get(f"/articles/{article}", headers={**IDENTITY, "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+
+
+def test_put_with_current_etag_applies_and_returns_new_version(client, auth, article):
+    etag = client.get(f"/articles/{article}", headers=IDENTITY).headers["ETag"]
+    updated = client.put(f"/articles/{article}", json={"Title": "Вторая"}, headers={**auth, "If-Match": etag})
+    assert updated.status_code == 200
+    assert updated.json()["Title"] == "Вторая"
+    assert updated.headers["ETag"] != etag
+    # Ответ PUT — то же представление, что отдаст GET
+    fresh = client.get(f"/articles/{article}", headers=IDENTITY)
+    assert fresh.headers["ETag"] == updated.headers["ETag"]
+    assert fresh.content == updated.content
+
+
+def test_put_with_stale_etag_returns_412(client, auth, article):
+    stale = client.get(f"/articles/{article}", headers=IDENTITY).headers["ETag"]
+    assert client.put(f"/articles/{article}", json={"Title": "Чужая правка"}, headers=auth).status_code == 200
+    conflict = client.put(f"/articles/{article}", json={"Title": "Моя правка"}, headers={**auth, "If-Match": stale})
+    assert conflict.status_code == 412
+    assert client.get(f"/articles/{article}").json()["Title"] == "Чужая правка"
+    assert client.delete(f"/articles/{article}", headers={**auth, "If-Match": stale}).status_code == 412
+
+
+def test_weak_or_foreign_etag_does_not_match(client, auth, article):
+    etag = client.get(f"/articles/{article}", headers=IDENTITY).headers["ETag"]
+    for tag in (f"W/{etag}", '"0-0"'):
+        response = client.put(f"/articles/{article}", json={"Title": "x"}, headers={**auth, "If-Match": tag})
+        assert response.status_code == 412
+
+
+def test_if_match_on_missing_article_returns_404(client, auth):
+    response = client.put("/articles/999999", json={"Title": "x"}, headers={**auth, "If-Match": '"999999-0"'})
+    assert response.status_code == 404
+
+
+def test_delete_with_current_etag(client, auth, article):
+    etag = client.get(f"/articles/{article}", headers=IDENTITY).headers["ETag"]
+    assert client.delete(f"/articles/{article}", headers={**auth, "If-Match": etag}).status_code == 204
+    assert client.get(f"/articles/{article}").status_code == 404
+
+
+@pytest.mark.parametrize("payload", [{"Title": None}, {"Body": None}, {"StatusId": None}, {"StatusId": 999}])
+def test_put_rejects_nulls_and_unknown_status(client, auth, article, payload):
+    assert client.put(f"/articles/{article}", json=payload, headers=auth).status_code == 400
+    assert client.get(f"/articles/{article}").json()["Title"] == ARTICLE["Title"]
@@ -0,0 +1,53 @@
+"""Число SQL-запросов на страницу статей не зависит от её размера (нет N+1)."""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.database import engine
+
+
+@contextmanager
+def count_queries():
+    counter = {"n": 0}
+
+    def on_execute(*args):
+        counter["n"] += 1
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+
+
+def _page_queries(limit: int, **filters) -> int:
+    # Новая сессия на замер: identity map не должна скрывать ленивые загрузки
+    with Session(bind=engine) as db, count_queries() as counter:
+        rows = crud.get_articles(db, limit=limit, **filters)
+        # Сериализация трогает Author, Status и Tags — как response_model роутера
+        out = [schemas.ArticleOut.model_validate(row).model_dump() for row in rows]
+    assert len(out) == limit
+    return counter["n"]
+
+
+def _dto_queries(limit: int, **filters) -> int:
+    with Session(bind=engine) as db, count_queries() as counter:
+        rows = crud.get_articles(db, limit=limit, as_dto=True, **filters)
+    assert len(rows) == limit
+    return counter["n"]
+
+
+@pytest.mark.parametrize("measure", [_page_queries, _dto_queries], ids=["orm", "dto"])
+@pytest.mark.parametrize("filters", [{}, {"status_id": 2}], ids=["all", "status"])
+def test_queries_per_page_do_not_grow_with_page_size(seeded, measure, filters):
+    assert measure(1, **filters) == measure(100, **filters)
+
+
+def test_article_detail_is_fixed_number_of_queries(seeded):
+    with Session(bind=engine) as db, count_queries() as counter:
+        art = crud.get_article(db, seeded["article_ids"][0])
+        schemas.ArticleOut.model_validate(art).model_dump()
+    assert counter["n"] == 2
@@ -0,0 +1,87 @@
+"""Чтение с реплики и read-your-writes на двух файлах SQLite.
+
+Реплика — копия primary, в которую запись не доходит: это реплика с
+бесконечным отставанием. Всё, что клиент видит сразу после своей записи,
+могло прийти только с primary.
+"""
+import os
+import shutil
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import database, models
+from app.cache import article_cache
+from app.database import engine_options, routing_session_class
+from app.main import app
+from app.utils.security import create_user_token
+
+ARTICLE = {"AuthorId": 1, "Title": "Свежая статья", "Body": "Только на primary", "StatusId": 2}
+
+
+def _article_count(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(models.Article)).scalar_one()
+
+
+@pytest.fixture
+def replicated(seeded, tmp_dir, monkeypatch):
+    primary_path = os.path.join(tmp_dir, "rw-primary.db")
+    replica_path = os.path.join(tmp_dir, "rw-replica.db")
+    database.engine.dispose()
+    shutil.copyfile(os.path.join(tmp_dir, "primary.db"), primary_path)
+    shutil.copyfile(primary_path, replica_path)
+    primary = create_engine(f"sqlite:///{primary_path}", **engine_options(f"sqlite:///{primary_path}"))
+    replica = create_engine(f"sqlite:///{replica_path}", **engine_options(f"sqlite:///{replica_path}"))
+    monkeypatch.setattr(database, "replica_engines", [replica])
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(
+        class_=routing_session_class(primary, [replica]), autoflush=False, autocommit=False
+    ))
+    article_cache.clear()
+    with database.SessionLocal() as db:
+        database.use_primary(db)
+        token = create_user_token(db.get(models.User, seeded["user_ids"][0]))
+    with TestClient(app) as client:
+        yield client, {"Authorization": f"Bearer {token}"}, primary, replica
+    article_cache.clear()
+    primary.dispose()
+    replica.dispose()
+
+
+def test_reads_go_to_replica_and_writes_to_primary(replicated):
+    client, auth, primary, replica = replicated
+    before = _article_count(replica)
+    created = client.post("/articles/", json=ARTICLE, headers=auth)
+    assert created.status_code == 201
+    assert _article_count(primary) == before + 1
+    assert _article_count(replica) == before
+    # Клиент без записей (другой ключ: без токена) читает реплику
+    assert client.get(f"/articles/{created.json()['ArticleId']}").status_code == 404
+
+
+def test_writer_reads_own_write_after_another_client_reads_replica(replicated):
+    client, auth, _, _ = replicated
+    created = client.post("/articles/", json=ARTICLE, headers=auth)
+    assert created.status_code == 201
+    article_id = created.json()["ArticleId"]
+    url = "/articles/all?limit=100&skip=100"
+
+    # Чужой клиент читает отстающую реплику: его ответ не должен попасть в кэш
+    stale = client.get(url)
+    assert article_id not in [a["ArticleId"] for a in stale.json()]
+    assert client.get(f"/articles/{article_id}").status_code == 404
+
+    # Писавший клиент в окне read-your-writes видит свою статью
+    own = client.get(url, headers=auth)
+    assert article_id in [a["ArticleId"] for a in own.json()]
+    detail = client.get(f"/articles/{article_id}", headers=auth)
+    assert detail.status_code == 200
+    assert detail.json()["Title"] == ARTICLE["Title"]
+
+
+def test_replica_responses_are_not_cached(replicated):
+    client, _, _, _ = replicated
+    assert client.get("/articles/all?limit=5").status_code == 200
+    assert len(article_cache) == 0
@@ -0,0 +1,86 @@
+"""Полнотекстовый поиск: ранжирование, префикс, пагинация и SQL-фолбэк на время построения индекса."""
+import pytest
+
+from app import crud, schemas
+from app import search as search_index
+from app.database import SessionLocal
+
+PAGED_WORD = "пагинатор"
+
+
+def _create(db, title: str, body: str) -> int:
+    article = schemas.ArticleCreate(AuthorId=1, Title=title, Body=body, StatusId=2)
+    return crud.create_article(db, article, author_id=1).ArticleId
+
+
+@pytest.fixture(scope="module")
+def corpus(seeded):
+    with SessionLocal() as db:
+        ids = {
+            "title": _create(db, "Датчик квазиточечный", "Обычный текст про плату"),
+            "body": _create(db, "Обзор платы", "В конце текста упомянут квазиточечный источник"),
+            "other": _create(db, "Другое", "Ничего общего"),
+            "yo": _create(db, "Ёлочная гирлянда", "На светодиодах"),
+            "paged": [_create(db, f"{PAGED_WORD} {n}", f"{PAGED_WORD} " * n) for n in range(1, 8)],
+        }
+    return ids
+
+
+def _search(db, query: str, **kwargs) -> list:
+    return [row["ArticleId"] for row in crud.get_articles(db, search=query, as_dto=True, **kwargs)]
+
+
+def test_title_match_ranks_above_body_match(corpus):
+    with SessionLocal() as db:
+        assert _search(db, "квазиточечный") == [corpus["title"], corpus["body"]]
+
+
+def test_last_word_is_a_prefix(corpus):
+    with SessionLocal() as db:
+        assert set(_search(db, "квазиточ")) == {corpus["title"], corpus["body"]}
+        assert _search(db, "квазиточечный датч") == [corpus["title"]]
+
+
+def test_yo_is_normalized(corpus):
+    with SessionLocal() as db:
+        assert _search(db, "елочная") == [corpus["yo"]]
+
+
+def test_pages_follow_relevance_without_overlap(corpus, client):
+    full = [a["ArticleId"] for a in client.get("/articles/", params={"search": PAGED_WORD, "limit": 100}).json()]
+    assert sorted(full) == sorted(corpus["paged"])
+    pages = []
+    for skip in range(0, len(full), 3):
+        page = client.get("/articles/", params={"search": PAGED_WORD, "skip": skip, "limit": 3})
+        assert "X-Next-Cursor" not in page.headers
+        pages += [a["ArticleId"] for a in page.json()]
+    assert pages == full
+
+
+def test_cursor_with_search_returns_400(corpus, client):
+    cursor = client.get("/articles/", params={"limit": 1}).headers["X-Next-Cursor"]
+    response = client.get("/articles/", params={"search": PAGED_WORD, "cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_update_and_delete_reach_the_index(corpus):
+    with SessionLocal() as db:
+        article_id = _create(db, "Временная заметка", "Текст")
+        assert _search(db, "временная") == [article_id]
+        crud.update_article(db, article_id, schemas.ArticleUpdate(Title="Постоянная заметка"))
+        assert _search(db, "временная") == []
+        assert _search(db, "постоянная") == [article_id]
+        crud.delete_article(db, article_id)
+        assert _search(db, "постоянная") == []
+
+
+def test_sql_fallback_while_index_is_built(corpus, monkeypatch):
+    # Индекса нет, а строит его другой поток: запрос не ждёт и ищет по Title и Excerpt
+    monkeypatch.setattr(search_index.backend, "ready", False)
+    assert search_index._rebuild_lock.acquire(blocking=False)
+    try:
+        with SessionLocal() as db:
+            assert _search(db, "квазиточечный") == [corpus["body"], corpus["title"]]
+            assert _search(db, "") == []
+    finally:
+        search_index._rebuild_lock.release()